@@ -1,4 +1,22 @@
 # Services module for AI integrations
-from app.services.groq_service import GroqService, get_groq_service
+import importlib
 
-__all__ = ["GroqService", "get_groq_service"]
+# Exports are imported on first access, so importing a light submodule
+# (e.g. app.services.groq_client) doesn't load the service and its
+# optional heavy dependencies
+_EXPORTS = {
+    "GroqService": "app.services.groq_service",
+    "get_groq_service": "app.services.groq_service",
+    "LLMCache": "app.services.llm_cache",
+    "SemanticCache": "app.services.semantic_cache",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
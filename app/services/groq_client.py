@@ -0,0 +1,77 @@
+"""
+Groq Client Module - Streamlit-cached Groq service and helpers shared by every page
+"""
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+
+@st.cache_resource
+def get_cached_groq_service():
+    """Return the Groq service shared by every page and session (None if misconfigured)"""
+    # Imported lazily: reruns served from the resource cache skip it entirely
+    from app.services.groq_service import get_groq_service
+
+    try:
+        return get_groq_service()
+    except ValueError as e:
+        st.error(f"Configuration Error: {str(e)}")
+        return None
+
+
+@st.cache_resource
+def get_executor():
+    """Return the thread pool pages run background requests on, shared by every page and session"""
+    return ThreadPoolExecutor(max_workers=8, thread_name_prefix="toolbox")
+
+
+def warn_if_rate_limited(groq_service, paragraphs=1):
+    """Toast when the requests for a task would have to wait for the rate limit
+
+    Paragraphs are sent in batches of up to MAX_BATCH_SIZE, one request per
+    batch. Best-effort extras (grammar rule lookups, follow-up prefetches)
+    are skipped rather than waited for, so they don't add to the wait.
+    """
+    if groq_service is None:
+        return
+    requests = -(-paragraphs // groq_service.MAX_BATCH_SIZE)
+    delay = groq_service.rate_limit_delay(requests)
+    if delay:
+        st.toast(f"Rate limited, waiting {delay:.0f}s...")
+
+
+# Results kept per page and session, so an edit only resends the paragraphs that changed
+MAX_CACHED_PARAGRAPHS = 256
+
+
+def paragraph_key(paragraph, *context):
+    """Identify a paragraph's result, e.g. in a given paraphrase style"""
+    return hashlib.sha256("\n".join((*context, paragraph.strip())).encode()).hexdigest()
+
+
+def lookup_paragraphs(cache_name, paragraphs, *context):
+    """Split paragraphs into those with a result in the session cache cache_name and the rest
+
+    Returns the paragraph keys in input order, the known results by key and
+    the paragraphs to send by key (each once, even if it is repeated).
+    """
+    cache = st.session_state.setdefault(cache_name, {})
+    keys = [paragraph_key(paragraph, *context) for paragraph in paragraphs]
+    known = {key: cache[key] for key in keys if key in cache}
+
+    missing = {}
+    for key, paragraph in zip(keys, paragraphs):
+        if key not in known:
+            missing.setdefault(key, paragraph)
+
+    return keys, known, missing
+
+
+def store_paragraphs(cache_name, results):
+    """Add results by key to the session cache cache_name, dropping the oldest beyond MAX_CACHED_PARAGRAPHS"""
+    cache = st.session_state.setdefault(cache_name, {})
+    cache.update(results)
+    while len(cache) > MAX_CACHED_PARAGRAPHS:
+        del cache[next(iter(cache))]
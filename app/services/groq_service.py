@@ -3,14 +3,357 @@ Groq Service Module - Direct integration with Groq API for all AI features
 """
 
 import os
-import json
-import re
-from typing import Dict, Any, List, Optional
-from groq import Groq
-from dotenv import load_dotenv
+import asyncio
+import functools
+import hashlib
+import threading
+import httpx
+import orjson
+from aiolimiter import AsyncLimiter
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+from app.services.llm_cache import LLMCache
+from app.services.preprocess import clean_and_truncate
+from app.services.semantic_cache import SemanticCache
+
+# ==================== PROMPT TEMPLATES ====================
+# Static prompt text, filled in with str.format at call time
+
+_CHAT_SYSTEM_PROMPT = """You are a helpful, friendly, and knowledgeable AI assistant. You provide accurate, 
+thoughtful responses to user questions. You're designed to be helpful, harmless, and honest.
+If you don't know something, admit it rather than making up information.
+If the question is unclear, ask for clarification. If the question is inappropriate, politely decline to answer."""
+
+_GRAMMAR_PROMPT = """You are a professional editor and an expert grammar tutor. Check the following text for grammar and spelling errors, factual errors, word choice issues, and suggest better word combinations.
+        
+Original text: {text}
+
+Provide your response in the following JSON format:
+
+```json
+{{
+  "corrections": [
+    {{
+      "error": "The original error text (the exact part of the sentence that is incorrect)",
+      "suggestion": "The corrected version of that specific part",
+      "type": "The type of error (e.g., spelling, grammar, punctuation, subject-verb agreement, verb tense, noun form, article usage, factual error, word choice, word combination)",
+      "explanation": "A brief, clear explanation of why this specific part is an error and how the suggestion fixes it."
+    }}
+  ],
+  "corrected_text": "The corrected version of the text with ONLY grammatical errors fixed. DO NOT completely paraphrase the text."
+}}
+```
+
+IMPORTANT INSTRUCTIONS:
+1. For the "corrected_text", maintain the original text structure and only fix actual errors. DO NOT completely rewrite or paraphrase the text.
+2. Only suggest complete paraphrasing when the correction type is specifically "word combination".
+3. For grammatical errors, make minimal changes necessary to fix the specific issue.
+4. Identify actual errors only - don't suggest stylistic changes unless they're grammatically incorrect.
+5. For each correction, the "error" field must contain the exact text from the original that contains the error.
+
+If there are no errors in the original text, return the original text as "corrected_text" and an empty array for "corrections".
+Ensure the JSON is well-formed."""
+
+_GRAMMAR_BATCH_PROMPT = """You are a professional editor and an expert grammar tutor. Check each of the following paragraphs for grammar and spelling errors, factual errors, word choice issues, and suggest better word combinations.
+
+Paragraphs (a JSON array of {count} strings): {paragraphs}
+
+Provide your response in the following JSON format, with exactly one entry in "results" per paragraph, in the same order:
+
+```json
+{{
+  "results": [
+    {{
+      "corrections": [
+        {{
+          "error": "The original error text (the exact part of the sentence that is incorrect)",
+          "suggestion": "The corrected version of that specific part",
+          "type": "The type of error (e.g., spelling, grammar, punctuation, subject-verb agreement, verb tense, noun form, article usage, factual error, word choice, word combination)",
+          "explanation": "A brief, clear explanation of why this specific part is an error and how the suggestion fixes it."
+        }}
+      ],
+      "corrected_text": "The corrected version of the paragraph with ONLY grammatical errors fixed. DO NOT completely paraphrase the paragraph."
+    }}
+  ]
+}}
+```
+
+IMPORTANT INSTRUCTIONS:
+1. For each "corrected_text", maintain the original paragraph structure and only fix actual errors. DO NOT completely rewrite or paraphrase the paragraph.
+2. Only suggest complete paraphrasing when the correction type is specifically "word combination".
+3. For grammatical errors, make minimal changes necessary to fix the specific issue.
+4. Identify actual errors only - don't suggest stylistic changes unless they're grammatically incorrect.
+5. For each correction, the "error" field must contain the exact text from the original that contains the error.
+
+If a paragraph has no errors, return it unchanged as its "corrected_text" with an empty array for "corrections".
+Return exactly {count} results and ensure the JSON is well-formed."""
+
+_GRAMMAR_RULE_PROMPT = """You are an expert grammar tutor. A student wrote "{error}" and it was corrected to "{suggestion}" ({error_type} error).
+
+Explain the grammar rule that was violated. Respond with ONLY a valid JSON object in the following format:
+
+```json
+{{
+  "rule_name": "A concise name for the grammar rule that was violated",
+  "description": "A detailed but simple, beginner-friendly explanation of the grammar rule.",
+  "correct_examples": ["Example 1", "Example 2"],
+  "incorrect_examples": ["Incorrect example 1", "Incorrect example 2"]
+}}
+```"""
+
+_HISTORY_SUMMARY_PROMPT = """Summarize the following conversation between a user and an AI assistant in a few sentences. Keep names, facts, decisions and open questions that later turns may refer to.
+
+{earlier}New messages:
+{transcript}
+
+Provide only the updated summary without any additional comments."""
+
+_PARAPHRASE_PROMPT = """You are an expert language paraphraser. Your task is to paraphrase the given text according to the specified style.
+
+Original text: {text}
+Style: {style}
+
+Style Guidelines:
+- Fluency: Make the text flow naturally and smoothly, focusing on readability.
+- Humanize: Make the text sound more conversational, warm, and relatable.
+- Formal: Use professional language, avoid contractions, and maintain a respectful tone.
+- Academic: Use scholarly language, precise terminology, and complex sentence structures.
+- Simple: Use straightforward language, short sentences, and common words.
+- Creative: Use vivid language, metaphors, and unique expressions.
+- Shorten: Condense the text while preserving the key information.
+
+Provide only the paraphrased text without any additional comments or explanations."""
+
+_PARAPHRASE_BATCH_PROMPT = """You are an expert language paraphraser. Your task is to paraphrase each of the given paragraphs according to the specified style.
+
+Paragraphs (a JSON array of {count} strings): {paragraphs}
+Style: {style}
+
+Style Guidelines:
+- Fluency: Make the text flow naturally and smoothly, focusing on readability.
+- Humanize: Make the text sound more conversational, warm, and relatable.
+- Formal: Use professional language, avoid contractions, and maintain a respectful tone.
+- Academic: Use scholarly language, precise terminology, and complex sentence structures.
+- Simple: Use straightforward language, short sentences, and common words.
+- Creative: Use vivid language, metaphors, and unique expressions.
+- Shorten: Condense the text while preserving the key information.
+
+Respond with ONLY a valid JSON object in the following format, with exactly one paraphrase per paragraph, in the same order:
+
+```json
+{{
+  "paraphrases": ["Paraphrase of the first paragraph", "Paraphrase of the second paragraph"]
+}}
+```"""
+
+_PLAGIARISM_PROMPT = """You are a plagiarism detection system. Given the input text, you must:
+
+1. Check if the text is likely AI-generated or copied from online sources.
+2. Compare it to your training data and common knowledge sources (e.g., Wikipedia, essays, articles).
+3. Analyze for typical AI-generated patterns like:
+   - Balanced paragraph structure with intro-middle-conclusion
+   - Transition phrases like "In conclusion", "On the one hand...", etc.
+   - Overly clean grammar without typos
+   - High-level vocabulary but no personal tone
+   - Generic or commonly seen ChatGPT-style answers
+   - Wordy, robotic, or unnaturally perfect phrasing
+
+Return a JSON object with the following fields:
+- plagiarism_score: A number from 0 to 100 indicating the likelihood of plagiarism or AI-generation
+- flagged_sentences: An array of sentences that appear to be copied or AI-generated
+- feedback: Detailed explanation of why certain parts were flagged and suggestions for improvement
+
+Here is the text to analyze:
+{text}
+
+Respond with ONLY a valid JSON object following this format:
+```json
+{{
+  "plagiarism_score": 78,
+  "flagged_sentences": [
+    "Artificial intelligence is transforming every industry in the modern world.",
+    "In conclusion, technology will shape the future of education."
+  ],
+  "feedback": "These sentences appear overly generic and match patterns often seen in AI-generated or public content. Consider personalizing or adding specific references."
+}}
+```"""
+
+_YOUTUBE_SUMMARY_PROMPT = """You are an expert content summarizer. Your task is to create a comprehensive yet concise summary of the following YouTube video transcript.
+{title_context}
+
+Transcript:
+{transcript}
+
+Please provide:
+1. A brief overview (2-3 sentences)
+2. Key points discussed in the video (bullet points)
+3. Main takeaways or conclusions
+
+Format your response clearly with headers."""
+
+
+def _template_version(*templates: str) -> str:
+    """Short digest of prompt templates, used to namespace cached responses"""
+    return hashlib.blake2b("".join(templates).encode(), digest_size=4).hexdigest()
+
+
+_PARAPHRASE_VERSION = _template_version(_PARAPHRASE_PROMPT)
+_GRAMMAR_VERSION = _template_version(_GRAMMAR_PROMPT, _GRAMMAR_RULE_PROMPT)
+_PLAGIARISM_VERSION = _template_version(_PLAGIARISM_PROMPT)
+_YOUTUBE_SUMMARY_VERSION = _template_version(_YOUTUBE_SUMMARY_PROMPT)
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """Whether a failed request is worth retrying (rate limits, server errors, timeouts)"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, (httpx.TimeoutException, httpx.NetworkError))
+
+
+# Jittered exponential backoff for transient API failures
+_retry_transient = retry(
+    retry=retry_if_exception(_is_retryable),
+    wait=wait_random_exponential(min=0.5, max=8),
+    stop=stop_after_attempt(5),
+    reraise=True,
+)
+
+
+def _single_flight(method):
+    """Coalesce concurrent identical calls of an async endpoint
+    
+    Completions are already coalesced one by one; this also shares the work
+    around them (cache lookups, grammar rule explanations, batch fallbacks)
+    between callers asking for the same result at the same time. Runs on the
+    service event loop, so the in-flight map needs no lock.
+    """
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        key = hashlib.sha256(orjson.dumps([method.__name__, args, kwargs], option=orjson.OPT_SORT_KEYS)).hexdigest()
+        task = self._endpoint_inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(method(self, *args, **kwargs))
+            self._endpoint_inflight[key] = task
+            task.add_done_callback(lambda _: self._endpoint_inflight.pop(key, None))
+        
+        # Shield the shared call so one cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(task)
+    
+    return wrapper
+
+
+class _JsonArrayStream:
+    """Incrementally extract the objects of one JSON array from streamed text
+    
+    Tracks brace depth and string state across fragments so each element of
+    the array named key can be parsed as soon as its closing brace arrives.
+    """
+    
+    def __init__(self, key: str):
+        self.key = f'"{key}"'
+        self.buffer = ""
+        self.pos = 0
+        self.in_array = False
+        self.done = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.start = 0
+    
+    def feed(self, fragment: str) -> List[Dict[str, Any]]:
+        """Add a text fragment and return any array elements it completed"""
+        self.buffer += fragment
+        items = []
+        
+        if not self.in_array and not self.done:
+            key_at = self.buffer.find(self.key)
+            bracket_at = self.buffer.find("[", key_at + len(self.key)) if key_at != -1 else -1
+            if bracket_at == -1:
+                return items
+            self.in_array = True
+            self.pos = bracket_at + 1
+        
+        buffer = self.buffer
+        i = self.pos
+        while self.in_array and i < len(buffer):
+            char = buffer[i]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.start = i
+                self.depth += 1
+            elif char == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        items.append(orjson.loads(buffer[self.start:i + 1]))
+                    except orjson.JSONDecodeError:
+                        pass
+            elif char == "]" and self.depth == 0:
+                self.in_array = False
+                self.done = True
+            i += 1
+        self.pos = i
+        
+        return items
+
+
+class _SharedStream:
+    """Fragments of an in-progress streamed completion, replayed to identical concurrent requests
+    
+    The leader appends fragments as they arrive; followers iterate over them
+    from the start, blocking until more arrive or the stream ends.
+    """
+    
+    def __init__(self):
+        self.parts: List[str] = []
+        self.done = False
+        self.failed = False
+        self.cond = threading.Condition()
+    
+    def append(self, part: str) -> None:
+        with self.cond:
+            self.parts.append(part)
+            self.cond.notify_all()
+    
+    def finish(self, failed: bool = False) -> None:
+        with self.cond:
+            self.done = True
+            self.failed = failed
+            self.cond.notify_all()
+    
+    def follow(self) -> Iterator[str]:
+        """Yield every fragment of the stream, raising if the leader's request failed"""
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.parts) and not self.done:
+                    self.cond.wait()
+                parts = self.parts[i:]
+                done, failed = self.done, self.failed
+            i += len(parts)
+            yield from parts
+            if done:
+                if failed:
+                    raise Exception("Groq API error: the shared streaming request was interrupted")
+                return
+
+
+@functools.lru_cache(maxsize=1)
+def _env() -> bool:
+    """Load environment variables from .env once, on first need"""
+    from dotenv import load_dotenv
+    return load_dotenv()
 
 
 class GroqService:
@@ -21,224 +364,930 @@ class GroqService:
         "openai/gpt-oss-120b": "GPT OSS 120B - Best for text tasks",
         "meta-llama/llama-4-maverick-17b-128e-instruct": "Llama 4 Maverick - Best for vision/image tasks",
         "llama-3.3-70b-versatile": "Llama 3.3 70B - Versatile",
+        "llama-3.1-8b-instant": "Llama 3.1 8B Instant - Fastest for short tasks",
     }
     
     # Model for text operations
     TEXT_MODEL = "openai/gpt-oss-120b"
     # Model for image/vision operations  
     IMAGE_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+    # Fast model for short, simple sub-tasks
+    FAST_MODEL = "llama-3.1-8b-instant"
     # Default model
     DEFAULT_MODEL = "openai/gpt-oss-120b"
     
+    # Routing thresholds for sending simple requests to FAST_MODEL
+    FAST_CHAT_MAX_TOKENS = 200
+    FAST_GRAMMAR_MAX_WORDS = 100
+    FAST_PARAPHRASE_STYLES = ("Simple", "Shorten")
+    # Markers of code or math, which stay on the larger model
+    COMPLEX_MARKERS = ("```", "=", "^", "\\", "√", "∫", "∑")
+    
+    # Groq's OpenAI-compatible REST endpoint, used directly for text completions
+    API_BASE_URL = "https://api.groq.com/openai/v1"
+    
+    # HTTP connection pool shared by every request
+    HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=40)
+    HTTP_TIMEOUT = 60.0
+    
+    # Chat history budget before older turns are summarized
+    HISTORY_MAX_TOKENS = 4000
+    HISTORY_SUMMARY_BLOCK = 8
+    
+    # Deadline for a page-level request made through run()
+    REQUEST_TIMEOUT = 30.0
+    
+    # Maximum number of text completions in flight at once
+    MAX_CONCURRENT_REQUESTS = 20
+    
+    # Requests per minute allowed by the API plan, overridable with GROQ_RPM
+    DEFAULT_RPM = 30
+    
+    # Deadline for the best-effort grammar rule lookups of one check
+    RULE_LOOKUP_TIMEOUT = 5.0
+    
+    # Likely follow-up questions answered ahead of time after each chat reply
+    FOLLOWUP_PROMPTS = (
+        "Can you explain that in more detail?",
+        "Can you give an example?",
+        "Can you summarize that?",
+    )
+    
+    # Maximum number of paragraphs sent in one batched paraphrase/grammar request
+    MAX_BATCH_SIZE = 20
+    
+    # Maximum number of images analyzed at once by analyze_images
+    MAX_CONCURRENT_IMAGES = 8
+    
+    # Maximum number of responses kept in the exact-match cache
+    CACHE_SIZE = 512
+    
+    # Character budget for user text embedded in paraphrase/plagiarism/summary prompts
+    MAX_INPUT_CHARS = 50000
+    
     def __init__(self):
+        # The SDK is only needed for vision requests; importing it here keeps
+        # it off the import path of every page that merely imports this module
+        from groq import Groq, AsyncGroq
+        
+        if "GROQ_API_KEY" not in os.environ:
+            _env()
         self.api_key = os.getenv("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables. Please set it in your .env file.")
-        self.client = Groq(api_key=self.api_key)
+        # Keep-alive HTTP/2 pools so reruns reuse TCP/TLS connections. Text
+        # completions are posted directly; the SDK clients handle vision requests
+        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        self.http = httpx.Client(base_url=self.API_BASE_URL, headers=headers, http2=True, limits=self.HTTP_LIMITS, timeout=self.HTTP_TIMEOUT)
+        self.async_http = httpx.AsyncClient(base_url=self.API_BASE_URL, headers=headers, http2=True, limits=self.HTTP_LIMITS, timeout=self.HTTP_TIMEOUT)
+        self.client = Groq(
+            api_key=self.api_key,
+            http_client=httpx.Client(http2=True, limits=self.HTTP_LIMITS, timeout=self.HTTP_TIMEOUT),
+        )
+        self.async_client = AsyncGroq(
+            api_key=self.api_key,
+            http_client=httpx.AsyncClient(http2=True, limits=self.HTTP_LIMITS, timeout=self.HTTP_TIMEOUT),
+        )
+        
+        # Dedicated event loop for async calls; the async clients' connection
+        # pools are bound to the loop they first run on, so every coroutine must
+        # run here rather than in a fresh asyncio.run() per Streamlit rerun
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="groq-service-loop", daemon=True).start()
+        
+        # In-flight requests by cache key, only touched from the service event loop
+        self._inflight: Dict[bytes, asyncio.Future] = {}
+        self._endpoint_inflight: Dict[str, asyncio.Future] = {}
+        
+        # In-progress streamed completions by cache key, touched from Streamlit threads
+        self._streams: Dict[bytes, _SharedStream] = {}
+        self._streams_lock = threading.Lock()
+        
+        # Concurrency caps; the async one is created on the service loop at first use
+        self._request_slots: Optional[asyncio.Semaphore] = None
+        self._stream_slots = threading.BoundedSemaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        # Client-side rate limit, so bursts wait for capacity instead of
+        # failing with 429s and retrying; it binds to the service loop on first use
+        try:
+            rpm = float(os.getenv("GROQ_RPM", self.DEFAULT_RPM))
+        except ValueError:
+            raise ValueError("GROQ_RPM must be a number of requests per minute.")
+        self._rate_limiter = AsyncLimiter(rpm, 60)
+        
+        # Exact-match response cache (LRU), shared by every Streamlit session
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Similarity-based cache for reworded chat messages (disabled without an embedding model).
+        # Tool requests only use the exact caches: a near-duplicate input (e.g. a
+        # different date) would otherwise get the result for another text
+        self._semantic_cache = SemanticCache()
+        
+        # Finished tool results persisted across restarts (disabled without diskcache)
+        self._llm_cache = LLMCache()
+    
+    def ping(self) -> bool:
+        """Open the pooled HTTP/2 connection to the API ahead of a request
+        
+        Lets callers overlap the TCP/TLS handshake with other work (e.g.
+        fetching a transcript). Returns whether the API answered; failures
+        are left for the real request to report.
+        """
+        try:
+            self.http.get("/models", timeout=5.0)
+            return True
+        except httpx.HTTPError:
+            return False
+    
+    def _cache_key(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int, use_reasoning: bool) -> bytes:
+        """Build a compact cache key for a completion request"""
+        payload = orjson.dumps(messages, option=orjson.OPT_SORT_KEYS)
+        params = f"{model}|{temperature}|{max_tokens}|{use_reasoning}".encode()
+        return hashlib.blake2b(payload + params, digest_size=16).digest()
+    
+    def clear_cache(self) -> None:
+        """Drop all cached responses"""
+        with self._cache_lock:
+            self._cache.clear()
+        self._semantic_cache.clear()
+    
+    def _select_model(self, text: str, task_type: str, style: str = None) -> str:
+        """Pick the fast model for short, simple requests and the text model otherwise"""
+        if task_type == "chat":
+            # Roughly four characters per token
+            if len(text) // 4 < self.FAST_CHAT_MAX_TOKENS and not any(marker in text for marker in self.COMPLEX_MARKERS):
+                return self.FAST_MODEL
+        elif task_type == "paraphrase":
+            if style in self.FAST_PARAPHRASE_STYLES:
+                return self.FAST_MODEL
+        elif task_type == "grammar":
+            if len(text.split()) < self.FAST_GRAMMAR_MAX_WORDS:
+                return self.FAST_MODEL
+        return self.TEXT_MODEL
+    
+    def _run(self, coro, timeout: float = None):
+        """Run a coroutine on the service event loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+    
+    def rate_limit_delay(self, requests: int = 1) -> float:
+        """Rough number of seconds the next requests would wait for the rate limiter (0 if none)"""
+        
+        async def delay():
+            limiter = self._rate_limiter
+            if limiter.has_capacity(requests):
+                return 0.0
+            # has_capacity() has just drained the bucket, so its level is current
+            excess = limiter._level + requests - limiter.max_rate
+            return excess * limiter.time_period / limiter.max_rate
+        
+        return self._run(delay())
+    
+    def run(self, coro, timeout: float = None):
+        """Run one of the *_async methods from a Streamlit script, with a deadline
+        
+        The coroutine is cancelled after timeout seconds (REQUEST_TIMEOUT by
+        default) and asyncio.TimeoutError is raised, so a hung request can
+        never block a page indefinitely. Shared in-flight requests and their
+        cache entries are unaffected by one caller timing out.
+        """
+        return self._run(asyncio.wait_for(coro, timeout or self.REQUEST_TIMEOUT))
+    
+    def _build_params(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int, use_reasoning: bool, stream: bool = False) -> Dict[str, Any]:
+        """Build the chat completion request parameters"""
+        params = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_completion_tokens": max_tokens,
+            "top_p": 1,
+            "stream": stream,
+            "stop": None,
+        }
+        
+        # Add reasoning_effort for models that support it
+        if use_reasoning and "gpt-oss" in model:
+            params["reasoning_effort"] = "medium"
+        
+        return params
     
-    def _call_groq(self, messages: List[Dict[str, str]], model: str = None, temperature: float = 1, max_tokens: int = 8192, use_reasoning: bool = True) -> str:
-        """Make a call to the Groq API"""
+    def _cache_lookup(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int, use_reasoning: bool, cache_namespace: str = None, cache_text: str = None) -> Tuple[Optional[str], Tuple]:
+        """Look a request up in the caches
+        
+        Returns the cached response (or None) and an opaque entry to pass to
+        _cache_store once the response is known.
+        """
+        key = self._cache_key(messages, model, temperature, max_tokens, use_reasoning)
+        cached = self._exact_lookup(key)
+        if cached is not None or not cache_namespace:
+            return cached, (key, None, None)
+        
+        vector = self._semantic_cache.embed(cache_text or messages[-1]["content"])
+        return self._semantic_lookup(key, vector, messages, model, temperature, max_tokens, use_reasoning, cache_namespace)
+    
+    async def _acache_lookup(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int, use_reasoning: bool, cache_namespace: str = None, cache_text: str = None) -> Tuple[Optional[str], Tuple]:
+        """Async counterpart of _cache_lookup, embedding off the service event loop"""
+        key = self._cache_key(messages, model, temperature, max_tokens, use_reasoning)
+        cached = self._exact_lookup(key)
+        if cached is not None or not cache_namespace:
+            return cached, (key, None, None)
+        
+        # Loading the embedding model and encoding are CPU-bound, so they run
+        # in a worker thread rather than stalling every session on the loop
+        vector = await asyncio.to_thread(self._semantic_cache.embed, cache_text or messages[-1]["content"])
+        return self._semantic_lookup(key, vector, messages, model, temperature, max_tokens, use_reasoning, cache_namespace)
+    
+    def _exact_lookup(self, key: bytes) -> Optional[str]:
+        """Serve identical requests from the cache"""
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return None
+    
+    def _semantic_lookup(self, key: bytes, vector, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int, use_reasoning: bool, cache_namespace: str) -> Tuple[Optional[str], Tuple]:
+        """Serve near-duplicate requests from the semantic cache (vector is None when it is disabled)"""
+        if vector is None:
+            return None, (key, None, None)
+        
+        context_key = self._cache_key(messages[:-1], model, temperature, max_tokens, use_reasoning)
+        cache_namespace = f"{cache_namespace}:{context_key.hex()}"
+        cached = self._semantic_cache.lookup(cache_namespace, vector)
+        if cached is not None:
+            return cached, (key, None, None)
+        
+        return None, (key, cache_namespace, vector)
+    
+    def _cache_store(self, entry: Tuple, content: str, cache_if: Callable[[str], bool] = None) -> None:
+        """Store a fresh response under the entry returned by _cache_lookup
+        
+        Empty responses, and those rejected by cache_if (e.g. a reply that
+        should be JSON but doesn't parse), are not cached so a retry makes a
+        fresh request.
+        """
+        if not content.strip() or (cache_if is not None and not cache_if(content)):
+            return
+        key, cache_namespace, vector = entry
+        with self._cache_lock:
+            self._cache[key] = content
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        if vector is not None:
+            self._semantic_cache.store(cache_namespace, vector, content)
+    
+    def _call_groq(self, messages: List[Dict[str, str]], model: str = None, temperature: float = 1, max_tokens: int = 8192, use_reasoning: bool = True, cache_namespace: str = None, cache_text: str = None, stream: bool = False):
+        """Make a call to the Groq API
+        
+        When cache_namespace is given, the response is also looked up in the
+        semantic cache by embedding cache_text (defaults to the last message).
+        Everything before the last message is part of the namespace, so only
+        requests sharing the same context can match.
+        
+        With stream=True an iterator over the raw completion chunks (decoded
+        server-sent events) is returned and the caches are bypassed; use _call_groq_stream for cached text streaming.
+        Non-streaming calls run on the service event loop so that identical
+        requests from concurrent sessions share a single API call.
+        """
         model = model or self.DEFAULT_MODEL
         
+        if stream:
+            params = self._build_params(messages, model, temperature, max_tokens, use_reasoning, stream=True)
+            return self._stream_chunks(params)
+        
+        return self._run(self._acall_groq(messages, model=model, temperature=temperature, max_tokens=max_tokens, use_reasoning=use_reasoning, cache_namespace=cache_namespace, cache_text=cache_text))
+    
+    def _call_groq_stream(self, messages: List[Dict[str, str]], model: str = None, temperature: float = 1, max_tokens: int = 8192, use_reasoning: bool = True, cache_namespace: str = None, cache_text: str = None, cache_if: Callable[[str], bool] = None) -> Iterator[str]:
+        """Stream a Groq completion as text fragments
+        
+        Cache hits are yielded in one piece; fresh completions are cached once
+        the stream has been fully consumed (see _cache_store for cache_if).
+        Concurrent identical requests (e.g. two tabs summarizing the same
+        video) share one API call: later ones replay the first one's stream.
+        """
+        model = model or self.DEFAULT_MODEL
+        
+        cached, entry = self._cache_lookup(messages, model, temperature, max_tokens, use_reasoning, cache_namespace, cache_text)
+        if cached is not None:
+            yield cached
+            return
+        
+        key = entry[0]
+        with self._streams_lock:
+            shared = self._streams.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._streams[key] = _SharedStream()
+        if not leader:
+            yield from shared.follow()
+            return
+        
+        parts = []
+        completed = False
         try:
-            # Build parameters
-            params = {
-                "model": model,
-                "messages": messages,
-                "temperature": temperature,
-                "max_completion_tokens": max_tokens,
-                "top_p": 1,
-                "stream": False,
-                "stop": None,
-            }
-            
-            # Add reasoning_effort for models that support it
-            if use_reasoning and "gpt-oss" in model:
-                params["reasoning_effort"] = "medium"
-            
-            completion = self.client.chat.completions.create(**params)
-            return completion.choices[0].message.content
+            chunks = self._call_groq(messages, model=model, temperature=temperature, max_tokens=max_tokens, use_reasoning=use_reasoning, stream=True)
+            for chunk in chunks:
+                if not chunk.get("choices"):
+                    continue
+                delta = chunk["choices"][0].get("delta", {}).get("content") or ""
+                if delta:
+                    parts.append(delta)
+                    shared.append(delta)
+                    yield delta
+            completed = True
+        except Exception as e:
+            raise Exception(f"Groq API error: {str(e)}")
+        finally:
+            # Cached before the stream is released, so no identical request slips
+            # in between; an early stop by the consumer fails the followers
+            if completed:
+                self._cache_store(entry, "".join(parts), cache_if)
+            with self._streams_lock:
+                self._streams.pop(key, None)
+            shared.finish(failed=not completed)
+    
+    async def _acall_groq(self, messages: List[Dict[str, str]], model: str = None, temperature: float = 1, max_tokens: int = 8192, use_reasoning: bool = True, cache_namespace: str = None, cache_text: str = None, cache_if: Callable[[str], bool] = None) -> str:
+        """Async counterpart of _call_groq, sharing the same caches
+        
+        Concurrent identical requests are coalesced: the first one issues the
+        API call and the others await its result. See _cache_store for cache_if.
+        """
+        model = model or self.DEFAULT_MODEL
+        
+        cached, entry = await self._acache_lookup(messages, model, temperature, max_tokens, use_reasoning, cache_namespace, cache_text)
+        if cached is not None:
+            return cached
+        
+        key = entry[0]
+        task = self._inflight.get(key)
+        if task is None:
+            params = self._build_params(messages, model, temperature, max_tokens, use_reasoning)
+            task = asyncio.ensure_future(self._request(params, entry, cache_if))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        
+        # Shield the shared request so one cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(task)
+    
+    async def _request(self, params: Dict[str, Any], entry: Tuple, cache_if: Callable[[str], bool] = None) -> str:
+        """Issue a single chat completion and cache the response"""
+        if self._request_slots is None:
+            self._request_slots = asyncio.Semaphore(self.MAX_CONCURRENT_REQUESTS)
+        
+        try:
+            async with self._request_slots:
+                content = await self._post_completion(params)
         except Exception as e:
             raise Exception(f"Groq API error: {str(e)}")
+        
+        self._cache_store(entry, content, cache_if)
+        return content
+    
+    @_retry_transient
+    async def _post_completion(self, params: Dict[str, Any]) -> str:
+        """Post a chat completion, retrying rate limits and transient failures"""
+        await self._rate_limiter.acquire()
+        response = await self.async_http.post("/chat/completions", content=orjson.dumps(params))
+        self._raise_for_status(response)
+        return orjson.loads(response.content)["choices"][0]["message"]["content"]
+    
+    def _stream_chunks(self, params: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Post a streaming chat completion and yield each decoded chunk"""
+        with self._stream_slots:
+            response = self._open_stream(params)
+            try:
+                for line in response.iter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    yield orjson.loads(data)
+            finally:
+                response.close()
+    
+    @_retry_transient
+    def _open_stream(self, params: Dict[str, Any]) -> httpx.Response:
+        """Open a streaming chat completion, retrying until the response headers are OK"""
+        self._run(self._rate_limiter.acquire())
+        request = self.http.build_request("POST", "/chat/completions", content=orjson.dumps(params))
+        response = self.http.send(request, stream=True)
+        if response.is_error:
+            response.read()
+            response.close()
+            self._raise_for_status(response)
+        return response
+    
+    def _raise_for_status(self, response: httpx.Response) -> None:
+        """Raise an HTTPStatusError carrying the API's error message"""
+        if not response.is_error:
+            return
+        try:
+            message = orjson.loads(response.content)["error"]["message"]
+        except Exception:
+            message = response.text
+        raise httpx.HTTPStatusError(f"Error code: {response.status_code} - {message}", request=response.request, response=response)
     
     def _extract_json(self, content: str) -> Dict[str, Any]:
         """Extract JSON from a response that might be wrapped in markdown code blocks"""
-        # Try to extract JSON if it's wrapped in markdown code blocks
-        json_match = re.search(r'```json\s*(.*?)\s*```', content, re.DOTALL)
-        if json_match:
-            content = json_match.group(1)
+        # Try to extract JSON if it's wrapped in markdown code blocks,
+        # then fall back to a fence without the json tag
+        start = content.find("```json")
+        if start != -1:
+            start += 7
+        else:
+            start = content.find("```")
+            start = start + 3 if start != -1 else -1
+        
+        if start != -1:
+            end = content.find("```", start)
+            content = content[start:end] if end != -1 else content[start:]
+        
+        return orjson.loads(content)
+    
+    def _is_json_object(self, content: str) -> bool:
+        """Whether a response holds a JSON object, i.e. is worth caching for a JSON endpoint"""
+        try:
+            return isinstance(self._extract_json(content), dict)
+        except orjson.JSONDecodeError:
+            return False
+    
+    def _batch_items(self, content: str, key: str, count: int, item_type: type) -> Optional[List[Any]]:
+        """Parse a batched response into exactly count items of item_type (None if it doesn't fit)"""
+        try:
+            items = self._extract_json(content)
+        except orjson.JSONDecodeError:
+            return None
+        if isinstance(items, dict):
+            items = items.get(key)
         
-        # Also try without the json tag
-        if not json_match:
-            json_match = re.search(r'```\s*(.*?)\s*```', content, re.DOTALL)
-            if json_match:
-                content = json_match.group(1)
+        if isinstance(items, list) and len(items) == count and all(isinstance(item, item_type) for item in items):
+            return items
+        return None
+    
+    async def _aclean_inputs(self, texts: List[str]) -> List[str]:
+        """clean_and_truncate texts for a prompt in a worker thread
         
-        return json.loads(content)
+        The first call imports numba and JIT-compiles the preprocessor, which
+        must not stall every session waiting on the service event loop.
+        """
+        return await asyncio.to_thread(lambda: [clean_and_truncate(text, self.MAX_INPUT_CHARS) for text in texts])
     
     # ==================== GRAMMAR CHECK ====================
     def check_grammar(self, text: str, model: str = None) -> Dict[str, Any]:
         """Check grammar and return detailed corrections"""
+        return self._run(self.check_grammar_async(text, model=model))
+    
+    @_single_flight
+    async def check_grammar_async(self, text: str, model: str = None) -> Dict[str, Any]:
+        """Check grammar and return detailed corrections
         
-        prompt = f"""You are a professional editor and an expert grammar tutor. Check the following text for grammar and spelling errors, factual errors, word choice issues, and suggest better word combinations.
+        The corrections are found in one call, then the grammar rule behind
+        each correction is explained by concurrent calls to the fast model
+        when the rate limit allows it. Results missing their grammar rules, or
+        taken from a response that didn't parse, are marked "partial": True
+        and are not persisted, so callers shouldn't keep them either.
+        """
+        cached = self._llm_cache.get(f"grammar:{_GRAMMAR_VERSION}", text, model=model)
+        if cached is not None:
+            return {**cached, "original_text": text}
         
-Original text: {text}
-
-Provide your response in the following JSON format:
-
-```json
-{{
-  "corrected_text": "The corrected version of the text with ONLY grammatical errors fixed. DO NOT completely paraphrase the text.",
-  "corrections": [
-    {{
-      "error": "The original error text (the exact part of the sentence that is incorrect)",
-      "suggestion": "The corrected version of that specific part",
-      "type": "The type of error (e.g., spelling, grammar, punctuation, subject-verb agreement, verb tense, noun form, article usage, factual error, word choice, word combination)",
-      "explanation": "A brief, clear explanation of why this specific part is an error and how the suggestion fixes it.",
-      "grammar_rule": {{
-        "rule_name": "A concise name for the grammar rule that was violated",
-        "description": "A detailed but simple, beginner-friendly explanation of the grammar rule.",
-        "correct_examples": ["Example 1", "Example 2"],
-        "incorrect_examples": ["Incorrect example 1", "Incorrect example 2"]
-      }}
-    }}
-  ]
-}}
-```
-
-IMPORTANT INSTRUCTIONS:
-1. For the "corrected_text", maintain the original text structure and only fix actual errors. DO NOT completely rewrite or paraphrase the text.
-2. Only suggest complete paraphrasing when the correction type is specifically "word combination".
-3. For grammatical errors, make minimal changes necessary to fix the specific issue.
-4. Identify actual errors only - don't suggest stylistic changes unless they're grammatically incorrect.
-5. For each correction, the "error" field must contain the exact text from the original that contains the error.
-
-If there are no errors in the original text, return the original text as "corrected_text" and an empty array for "corrections".
-Ensure the JSON is well-formed."""
-
-        messages = [{"role": "user", "content": prompt}]
+        messages = [{"role": "user", "content": self._grammar_prompt(text)}]
+        response = None
         
         try:
-            response = self._call_groq(messages, model=model or self.TEXT_MODEL, temperature=1)
-            result = self._extract_json(response)
-            
-            # Ensure required fields exist
-            if "corrected_text" not in result:
-                result["corrected_text"] = text
-            if "corrections" not in result:
-                result["corrections"] = []
-            
+            response = await self._acall_groq(messages, model=model or self._select_model(text, "grammar"), temperature=1, cache_if=self._is_json_object)
+            result = self._grammar_result(text, response)
+            # Results missing their grammar rules are not persisted
+            if await self._explain_corrections(result["corrections"]):
+                self._llm_cache.set(f"grammar:{_GRAMMAR_VERSION}", text, result, model=model)
+            else:
+                result["partial"] = True
+            return result
+        except orjson.JSONDecodeError:
+            # If JSON parsing fails, return the response as corrected text
             return {
                 "original_text": text,
-                "corrected_text": result["corrected_text"],
-                "corrections": result["corrections"]
+                "corrected_text": response or text,
+                "corrections": [],
+                "partial": True
             }
-        except json.JSONDecodeError:
-            # If JSON parsing fails, return the response as corrected text
-            return {
+        except Exception as e:
+            return {"error": str(e)}
+    
+    def check_grammar_stream(self, text: str, model: str = None) -> Iterator[Dict[str, Any]]:
+        """Check grammar, yielding each correction as soon as it is generated
+        
+        Yields {"correction": {...}} for every correction while the response
+        streams in, then a final result in the same shape as check_grammar
+        (with grammar rules filled in when the rate limit allows it).
+        """
+        cached = self._llm_cache.get(f"grammar:{_GRAMMAR_VERSION}", text, model=model)
+        if cached is not None:
+            yield {**cached, "original_text": text}
+            return
+        
+        messages = [{"role": "user", "content": self._grammar_prompt(text)}]
+        parser = _JsonArrayStream("corrections")
+        parts = []
+        
+        try:
+            for fragment in self._call_groq_stream(messages, model=model or self._select_model(text, "grammar"), temperature=1, cache_if=self._is_json_object):
+                parts.append(fragment)
+                for correction in parser.feed(fragment):
+                    yield {"correction": correction}
+        except Exception as e:
+            yield {"error": str(e)}
+            return
+        
+        response = "".join(parts)
+        try:
+            result = self._grammar_result(text, response)
+            # Results missing their grammar rules are not persisted
+            if self._run(self._explain_corrections(result["corrections"])):
+                self._llm_cache.set(f"grammar:{_GRAMMAR_VERSION}", text, result, model=model)
+            else:
+                result["partial"] = True
+            yield result
+        except orjson.JSONDecodeError:
+            yield {
                 "original_text": text,
-                "corrected_text": response if 'response' in dir() else text,
-                "corrections": []
+                "corrected_text": response or text,
+                "corrections": [],
+                "partial": True
             }
+        except Exception as e:
+            yield {"error": str(e)}
+    
+    def check_grammar_batch(self, paragraphs: List[str], model: str = None) -> Dict[str, Any]:
+        """Check several paragraphs at once, in the same result shape as check_grammar
+        
+        Up to MAX_BATCH_SIZE paragraphs share one request; larger inputs are
+        split into batches that run concurrently. A batch whose response
+        cannot be parsed is retried one paragraph at a time.
+        
+        The per-paragraph results are also returned, as "paragraph_results".
+        """
+        return self._run(self.check_grammar_batch_async(paragraphs, model=model))
+    
+    @_single_flight
+    async def check_grammar_batch_async(self, paragraphs: List[str], model: str = None) -> Dict[str, Any]:
+        """Async counterpart of check_grammar_batch"""
+        size = self.MAX_BATCH_SIZE
+        batches = [paragraphs[i:i + size] for i in range(0, len(paragraphs), size)]
+        
+        try:
+            results = await asyncio.gather(*(self._check_grammar_batch(batch, model) for batch in batches))
         except Exception as e:
             return {"error": str(e)}
+        
+        results = [result for batch in results for result in batch]
+        for result in results:
+            if "error" in result:
+                return result
+        
+        return {
+            "original_text": "\n\n".join(paragraphs),
+            "corrected_text": "\n\n".join(result["corrected_text"] for result in results),
+            "corrections": [correction for result in results for correction in result["corrections"]],
+            "paragraph_results": results
+        }
     
-    # ==================== CHAT ====================
-    def chat(self, message: str, conversation_history: List[Dict[str, str]] = None, model: str = None) -> Dict[str, Any]:
-        """Chat with AI assistant"""
+    async def _check_grammar_batch(self, paragraphs: List[str], model: str = None) -> List[Dict[str, Any]]:
+        """Check one batch of paragraphs, returning one check_grammar result per paragraph"""
+        if len(paragraphs) > 1:
+            text = "\n\n".join(paragraphs)
+            prompt = _GRAMMAR_BATCH_PROMPT.format(count=len(paragraphs), paragraphs=orjson.dumps(paragraphs).decode())
+            messages = [{"role": "user", "content": prompt}]
+            
+            count = len(paragraphs)
+            response = await self._acall_groq(
+                messages, model=model or self._select_model(text, "grammar"), temperature=1,
+                cache_if=lambda content: self._batch_items(content, "results", count, dict) is not None
+            )
+            items = self._batch_items(response, "results", count, dict)
+            
+            if items is not None:
+                results = [
+                    {
+                        "original_text": paragraph,
+                        "corrected_text": item.get("corrected_text", paragraph),
+                        "corrections": item.get("corrections") or []
+                    }
+                    for paragraph, item in zip(paragraphs, items)
+                ]
+                if not await self._explain_corrections([correction for result in results for correction in result["corrections"]]):
+                    for result in results:
+                        if result["corrections"]:
+                            result["partial"] = True
+                return results
         
-        system_prompt = """You are a helpful, friendly, and knowledgeable AI assistant. You provide accurate, 
-thoughtful responses to user questions. You're designed to be helpful, harmless, and honest.
-If you don't know something, admit it rather than making up information.
-If the question is unclear, ask for clarification. If the question is inappropriate, politely decline to answer."""
+        # Fall back to one request per paragraph
+        return await asyncio.gather(*(self.check_grammar_async(paragraph, model=model) for paragraph in paragraphs))
+    
+    def _grammar_prompt(self, text: str) -> str:
+        """Build the prompt for finding grammar corrections"""
+        
+        prompt = _GRAMMAR_PROMPT.format(text=text)
+        
+        return prompt
+    
+    def _grammar_result(self, text: str, response: str) -> Dict[str, Any]:
+        """Parse a grammar response into the check_grammar result shape"""
+        result = self._extract_json(response)
+        
+        # Ensure required fields exist
+        if "corrected_text" not in result:
+            result["corrected_text"] = text
+        if "corrections" not in result:
+            result["corrections"] = []
+        
+        return {
+            "original_text": text,
+            "corrected_text": result["corrected_text"],
+            "corrections": result["corrections"]
+        }
+    
+    async def _explain_corrections(self, corrections: List[Dict[str, Any]]) -> bool:
+        """Attach a grammar rule to every correction, explaining them concurrently
         
-        messages = [{"role": "system", "content": system_prompt}]
+        Rule lookups are best effort: they are skipped when the rate limiter
+        cannot take them all right away and abandoned after
+        RULE_LOOKUP_TIMEOUT seconds, so they can never stall or time out the
+        check itself. Returns whether the lookups ran to completion.
+        """
+        if not corrections:
+            return True
+        if not self._rate_limiter.has_capacity(len(corrections)):
+            return False
         
-        # Add conversation history if provided
+        try:
+            rules = await asyncio.wait_for(
+                asyncio.gather(
+                    *[self._explain_error(correction) for correction in corrections],
+                    return_exceptions=True
+                ),
+                self.RULE_LOOKUP_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return False
+        
+        for correction, rule in zip(corrections, rules):
+            if isinstance(rule, dict):
+                correction["grammar_rule"] = rule
+        return True
+    
+    async def _explain_error(self, correction: Dict[str, Any]) -> Dict[str, Any]:
+        """Describe the grammar rule behind a single correction"""
+        
+        prompt = _GRAMMAR_RULE_PROMPT.format(error=correction.get("error", ""), suggestion=correction.get("suggestion", ""), error_type=correction.get("type", "grammar"))
+
+        messages = [{"role": "user", "content": prompt}]
+        response = await self._acall_groq(messages, model=self.FAST_MODEL, temperature=0.5, max_tokens=1024, cache_if=self._is_json_object)
+        return self._extract_json(response)
+    
+    # ==================== CHAT ====================
+    def _chat_messages(self, message: str, conversation_history: List[Dict[str, str]] = None, summary_state: Dict[str, Any] = None) -> List[Dict[str, str]]:
+        """Build the message list for a chat turn"""
+        
+        messages = [{"role": "system", "content": _CHAT_SYSTEM_PROMPT}]
+        
+        # Add conversation history if provided, keeping it within the token budget
         if conversation_history:
-            for msg in conversation_history:
+            for msg in self._compact_history(conversation_history, summary_state=summary_state):
                 messages.append(msg)
         
         messages.append({"role": "user", "content": message})
+        return messages
+    
+    def _compact_history(self, history: List[Dict[str, str]], max_tokens: int = None, summary_state: Dict[str, Any] = None) -> List[Dict[str, str]]:
+        """Keep the most recent turns that fit in max_tokens and summarize the rest
+        
+        Older turns are dropped in whole blocks of HISTORY_SUMMARY_BLOCK
+        messages and folded into a running summary one block at a time.
+        summary_state is a dict owned by the conversation (e.g. kept in
+        st.session_state) holding the running summary and how many leading
+        messages it covers, so each block is only summarized once per
+        conversation. Without it, every dropped block is summarized again.
+        """
+        max_tokens = max_tokens or self.HISTORY_MAX_TOKENS
+        state = summary_state if summary_state is not None else {}
+        
+        # Find the oldest message that still fits (roughly four characters per token)
+        keep_from = len(history)
+        used = 0
+        for i in range(len(history) - 1, -1, -1):
+            used += len(history[i]["content"]) // 4
+            if used > max_tokens:
+                break
+            keep_from = i
+        
+        # A shorter history means a different conversation, so its summary no longer applies
+        summarized = state.get("summarized", 0)
+        if summarized > len(history):
+            state.clear()
+            summarized = 0
+        
+        if keep_from == 0 and not summarized:
+            return list(history)
+        
+        # Round up to a block boundary so the summary only changes once per block;
+        # messages already in the summary stay there
+        block = self.HISTORY_SUMMARY_BLOCK
+        dropped = max(min(-(-keep_from // block) * block, len(history)), summarized)
+        
+        summary = state.get("summary")
+        for start in range(summarized, dropped, block):
+            summary = self._summarize_turns(history[start:start + block], summary)
+        state["summary"] = summary
+        state["summarized"] = dropped
+        
+        compacted = list(history[dropped:])
+        if summary:
+            compacted.insert(0, {"role": "system", "content": f"Earlier summary: {summary}"})
+        return compacted
+    
+    def _summarize_turns(self, turns: List[Dict[str, str]], previous_summary: str = None) -> Optional[str]:
+        """Fold a block of conversation turns into the running summary"""
+        
+        transcript = "\n".join(f"{msg['role']}: {msg['content']}" for msg in turns)
+        earlier = f"Summary so far:\n{previous_summary}\n\n" if previous_summary else ""
+        
+        prompt = _HISTORY_SUMMARY_PROMPT.format(earlier=earlier, transcript=transcript)
+
+        messages = [{"role": "user", "content": prompt}]
         
         try:
-            response = self._call_groq(messages, model=model or self.TEXT_MODEL, temperature=1)
+            return self._call_groq(messages, model=self.FAST_MODEL, temperature=0, max_tokens=512).strip()
+        except Exception:
+            # Losing the summary is better than failing the chat turn
+            return previous_summary
+    
+    def chat(self, message: str, conversation_history: List[Dict[str, str]] = None, model: str = None, summary_state: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Chat with AI assistant (see _compact_history for summary_state)"""
+        
+        messages = self._chat_messages(message, conversation_history, summary_state)
+        
+        try:
+            response = self._call_groq(messages, model=model or self._select_model(message, "chat"), temperature=1, cache_namespace="chat")
             return {"response": response}
         except Exception as e:
             return {"error": str(e)}
     
+    def chat_stream(self, message: str, conversation_history: List[Dict[str, str]] = None, model: str = None, summary_state: Dict[str, Any] = None) -> Iterator[str]:
+        """Chat with AI assistant, yielding the response as it is generated (see _compact_history for summary_state)"""
+        
+        messages = self._chat_messages(message, conversation_history, summary_state)
+        return self._call_groq_stream(messages, model=model or self._select_model(message, "chat"), temperature=1, cache_namespace="chat")
+    
+    def prefetch_followups(self, conversation_history: List[Dict[str, str]], summary_state: Dict[str, Any] = None) -> None:
+        """Answer likely follow-ups in the background so they become cache hits
+        
+        Only worthwhile with the semantic cache, which lets a differently
+        worded follow-up match a prefetched one. Runs on a daemon thread since
+        building the messages may itself need a (blocking) history summary;
+        the thread works on a copy of the conversation's summary_state.
+        """
+        # Best-effort requests must not queue up behind the rate limit
+        if not conversation_history or not self._semantic_cache.enabled or not self._run(self._prefetch_capacity()):
+            return
+        threading.Thread(target=self._prefetch_followups, args=(list(conversation_history), dict(summary_state or {})), name="groq-prefetch", daemon=True).start()
+    
+    def _prefetch_followups(self, conversation_history: List[Dict[str, str]], summary_state: Dict[str, Any]) -> None:
+        # Same messages, model and parameters as chat_stream would use, so the
+        # cache namespace matches the real follow-up turn
+        requests = [
+            (self._chat_messages(followup, conversation_history, summary_state), self._select_model(followup, "chat"))
+            for followup in self.FOLLOWUP_PROMPTS
+        ]
+        
+        async def prefetch_all():
+            # Checked again on the loop, since building the messages may have taken a while
+            if not await self._prefetch_capacity():
+                return
+            # Requests that already hit the cache return without an API call
+            await asyncio.gather(
+                *(self._acall_groq(messages, model=model, temperature=1, cache_namespace="chat") for messages, model in requests),
+                return_exceptions=True
+            )
+        
+        try:
+            self._run(prefetch_all())
+        except Exception:
+            # Prefetching is best effort
+            pass
+    
+    async def _prefetch_capacity(self) -> bool:
+        """Whether the rate limiter can take every prefetch and still leave a slot for the next real request"""
+        return self._rate_limiter.has_capacity(len(self.FOLLOWUP_PROMPTS) + 1)
+    
     # ==================== PARAPHRASE ====================
     def paraphrase(self, text: str, style: str, model: str = None) -> Dict[str, Any]:
         """Paraphrase text in a specified style"""
+        return self._run(self.paraphrase_async(text, style, model=model))
+    
+    @_single_flight
+    async def paraphrase_async(self, text: str, style: str, model: str = None) -> Dict[str, Any]:
+        """Paraphrase text in a specified style"""
         
-        prompt = f"""You are an expert language paraphraser. Your task is to paraphrase the given text according to the specified style.
-
-Original text: {text}
-Style: {style}
-
-Style Guidelines:
-- Fluency: Make the text flow naturally and smoothly, focusing on readability.
-- Humanize: Make the text sound more conversational, warm, and relatable.
-- Formal: Use professional language, avoid contractions, and maintain a respectful tone.
-- Academic: Use scholarly language, precise terminology, and complex sentence structures.
-- Simple: Use straightforward language, short sentences, and common words.
-- Creative: Use vivid language, metaphors, and unique expressions.
-- Shorten: Condense the text while preserving the key information.
-
-Provide only the paraphrased text without any additional comments or explanations."""
+        cached = self._llm_cache.get(f"paraphrase:{_PARAPHRASE_VERSION}", text, style=style, model=model)
+        if cached is not None:
+            return {**cached, "original_text": text}
+        
+        (cleaned,) = await self._aclean_inputs([text])
+        prompt = _PARAPHRASE_PROMPT.format(text=cleaned, style=style)
 
         messages = [{"role": "user", "content": prompt}]
         
         try:
-            response = self._call_groq(messages, model=model or self.TEXT_MODEL, temperature=1)
-            return {
+            response = await self._acall_groq(messages, model=model or self._select_model(cleaned, "paraphrase", style=style), temperature=1)
+            result = {
                 "original_text": text,
                 "paraphrased_text": response.strip(),
                 "style": style
             }
+            if result["paraphrased_text"]:
+                self._llm_cache.set(f"paraphrase:{_PARAPHRASE_VERSION}", text, result, style=style, model=model)
+            return result
         except Exception as e:
             return {"error": str(e)}
     
+    def paraphrase_batch(self, paragraphs: List[str], style: str, model: str = None) -> Dict[str, Any]:
+        """Paraphrase several paragraphs at once, in the same result shape as paraphrase
+        
+        Up to MAX_BATCH_SIZE paragraphs share one request; larger inputs are
+        split into batches that run concurrently. A batch whose response
+        cannot be parsed is retried one paragraph at a time.
+        
+        The per-paragraph paraphrases are also returned, as "paraphrased_paragraphs".
+        """
+        return self._run(self.paraphrase_batch_async(paragraphs, style, model=model))
+    
+    @_single_flight
+    async def paraphrase_batch_async(self, paragraphs: List[str], style: str, model: str = None) -> Dict[str, Any]:
+        """Async counterpart of paraphrase_batch"""
+        size = self.MAX_BATCH_SIZE
+        batches = [paragraphs[i:i + size] for i in range(0, len(paragraphs), size)]
+        
+        try:
+            results = await asyncio.gather(*(self._paraphrase_batch(batch, style, model) for batch in batches))
+        except Exception as e:
+            return {"error": str(e)}
+        
+        paraphrased = [paraphrased for batch in results for paraphrased in batch]
+        return {
+            "original_text": "\n\n".join(paragraphs),
+            "paraphrased_text": "\n\n".join(paraphrased),
+            "paraphrased_paragraphs": paraphrased,
+            "style": style
+        }
+    
+    async def _paraphrase_batch(self, paragraphs: List[str], style: str, model: str = None) -> List[str]:
+        """Paraphrase one batch of paragraphs, returning one paraphrase per paragraph"""
+        model = model or self._select_model("", "paraphrase", style=style)
+        paragraphs = await self._aclean_inputs(paragraphs)
+        
+        if len(paragraphs) > 1:
+            prompt = _PARAPHRASE_BATCH_PROMPT.format(count=len(paragraphs), paragraphs=orjson.dumps(paragraphs).decode(), style=style)
+            messages = [{"role": "user", "content": prompt}]
+            
+            count = len(paragraphs)
+            response = await self._acall_groq(
+                messages, model=model, temperature=1,
+                cache_if=lambda content: self._batch_items(content, "paraphrases", count, str) is not None
+            )
+            items = self._batch_items(response, "paraphrases", count, str)
+            
+            if items is not None:
+                return [item.strip() for item in items]
+        
+        # Fall back to one request per paragraph
+        responses = await asyncio.gather(*(
+            self._acall_groq([{"role": "user", "content": _PARAPHRASE_PROMPT.format(text=paragraph, style=style)}], model=model, temperature=1)
+            for paragraph in paragraphs
+        ))
+        return [response.strip() for response in responses]
+    
     # ==================== PLAGIARISM CHECK ====================
     def check_plagiarism(self, text: str, model: str = None) -> Dict[str, Any]:
         """Check text for plagiarism/AI-generated content"""
+        return self._run(self.check_plagiarism_async(text, model=model))
+    
+    @_single_flight
+    async def check_plagiarism_async(self, text: str, model: str = None) -> Dict[str, Any]:
+        """Check text for plagiarism/AI-generated content"""
         
-        prompt = f"""You are a plagiarism detection system. Given the input text, you must:
-
-1. Check if the text is likely AI-generated or copied from online sources.
-2. Compare it to your training data and common knowledge sources (e.g., Wikipedia, essays, articles).
-3. Analyze for typical AI-generated patterns like:
-   - Balanced paragraph structure with intro-middle-conclusion
-   - Transition phrases like "In conclusion", "On the one hand...", etc.
-   - Overly clean grammar without typos
-   - High-level vocabulary but no personal tone
-   - Generic or commonly seen ChatGPT-style answers
-   - Wordy, robotic, or unnaturally perfect phrasing
-
-Return a JSON object with the following fields:
-- plagiarism_score: A number from 0 to 100 indicating the likelihood of plagiarism or AI-generation
-- flagged_sentences: An array of sentences that appear to be copied or AI-generated
-- feedback: Detailed explanation of why certain parts were flagged and suggestions for improvement
-
-Here is the text to analyze:
-{text}
-
-Respond with ONLY a valid JSON object following this format:
-```json
-{{
-  "plagiarism_score": 78,
-  "flagged_sentences": [
-    "Artificial intelligence is transforming every industry in the modern world.",
-    "In conclusion, technology will shape the future of education."
-  ],
-  "feedback": "These sentences appear overly generic and match patterns often seen in AI-generated or public content. Consider personalizing or adding specific references."
-}}
-```"""
+        cached = self._llm_cache.get(f"plagiarism:{_PLAGIARISM_VERSION}", text, model=model)
+        if cached is not None:
+            return {**cached, "original_text": text}
+        
+        (cleaned,) = await self._aclean_inputs([text])
+        prompt = _PLAGIARISM_PROMPT.format(text=cleaned)
 
         messages = [{"role": "user", "content": prompt}]
         
         try:
-            response = self._call_groq(messages, model=model or self.TEXT_MODEL, temperature=1)
+            response = await self._acall_groq(messages, model=model or self.TEXT_MODEL, temperature=1, cache_if=self._is_json_object)
             result = self._extract_json(response)
             
             # Ensure required fields exist
@@ -249,57 +1298,85 @@ Respond with ONLY a valid JSON object following this format:
             if "feedback" not in result:
                 result["feedback"] = "No issues detected in the text."
             
-            return {
+            result = {
                 "original_text": text,
                 "plagiarism_score": result["plagiarism_score"],
                 "flagged_sentences": result["flagged_sentences"],
                 "feedback": result["feedback"]
             }
-        except json.JSONDecodeError:
-            return {
-                "original_text": text,
-                "plagiarism_score": 0,
-                "flagged_sentences": [],
-                "feedback": "Unable to analyze text. Please try again."
-            }
+            self._llm_cache.set(f"plagiarism:{_PLAGIARISM_VERSION}", text, result, model=model)
+            return result
+        except orjson.JSONDecodeError:
+            # Reported as an error so no cache layer keeps the failed analysis
+            return {"error": "Unable to analyze text. Please try again."}
         except Exception as e:
             return {"error": str(e)}
     
     # ==================== YOUTUBE SUMMARIZATION ====================
     def summarize_youtube(self, transcript: str, video_title: str = "", model: str = None) -> Dict[str, Any]:
         """Summarize YouTube video transcript"""
+        return self._run(self.summarize_youtube_async(transcript, video_title, model=model))
+    
+    @_single_flight
+    async def summarize_youtube_async(self, transcript: str, video_title: str = "", model: str = None) -> Dict[str, Any]:
+        """Summarize YouTube video transcript"""
         
-        title_context = f"\nVideo Title: {video_title}" if video_title else ""
+        cached = self._llm_cache.get(f"youtube:{_YOUTUBE_SUMMARY_VERSION}", transcript, style=video_title, model=model)
+        if cached is not None:
+            return cached
         
-        prompt = f"""You are an expert content summarizer. Your task is to create a comprehensive yet concise summary of the following YouTube video transcript.
-{title_context}
-
-Transcript:
-{transcript}
-
-Please provide:
-1. A brief overview (2-3 sentences)
-2. Key points discussed in the video (bullet points)
-3. Main takeaways or conclusions
-
-Format your response clearly with headers."""
-
-        messages = [{"role": "user", "content": prompt}]
+        # Preprocessing the transcript is CPU-bound, so it stays off the event loop
+        messages = await asyncio.to_thread(self._youtube_summary_messages, transcript, video_title)
         
         try:
-            response = self._call_groq(messages, model=model or self.TEXT_MODEL, temperature=1, max_tokens=2048)
-            return {
+            response = await self._acall_groq(messages, model=model or self.TEXT_MODEL, temperature=1, max_tokens=2048)
+            result = {
                 "summary": response,
                 "title": video_title or "YouTube Video Summary"
             }
+            if result["summary"]:
+                self._llm_cache.set(f"youtube:{_YOUTUBE_SUMMARY_VERSION}", transcript, result, style=video_title, model=model)
+            return result
         except Exception as e:
             return {"error": str(e)}
     
-    # ==================== IMAGE ANALYSIS ====================
-    def analyze_image(self, image_url: str, prompt: str = "Describe this image in detail.", model: str = None) -> Dict[str, Any]:
-        """Analyze an image using the vision model"""
+    def summarize_youtube_stream(self, transcript: str, video_title: str = "", model: str = None) -> Iterator[str]:
+        """Summarize YouTube video transcript, yielding the summary as it is generated
+        
+        Raises on API errors, like chat_stream.
+        """
+        cached = self._llm_cache.get(f"youtube:{_YOUTUBE_SUMMARY_VERSION}", transcript, style=video_title, model=model)
+        if cached is not None:
+            yield cached["summary"]
+            return
+        
+        messages = self._youtube_summary_messages(transcript, video_title)
+        parts = []
+        
+        for fragment in self._call_groq_stream(messages, model=model or self.TEXT_MODEL, temperature=1, max_tokens=2048):
+            parts.append(fragment)
+            yield fragment
         
-        messages = [
+        result = {
+            "summary": "".join(parts),
+            "title": video_title or "YouTube Video Summary"
+        }
+        if result["summary"]:
+            self._llm_cache.set(f"youtube:{_YOUTUBE_SUMMARY_VERSION}", transcript, result, style=video_title, model=model)
+    
+    def _youtube_summary_messages(self, transcript: str, video_title: str = "") -> List[Dict[str, str]]:
+        """Build the message list for a transcript summary"""
+        
+        title_context = f"\nVideo Title: {video_title}" if video_title else ""
+        
+        prompt = _YOUTUBE_SUMMARY_PROMPT.format(title_context=title_context, transcript=clean_and_truncate(transcript, self.MAX_INPUT_CHARS))
+
+        return [{"role": "user", "content": prompt}]
+    
+    # ==================== IMAGE ANALYSIS ====================
+    def _image_messages(self, image_url: str, prompt: str) -> List[Dict[str, Any]]:
+        """Build the multimodal message for an image analysis request"""
+        return [
             {
                 "role": "user",
                 "content": [
@@ -316,8 +1393,14 @@ Format your response clearly with headers."""
                 ]
             }
         ]
+    
+    def analyze_image(self, image_url: str, prompt: str = "Describe this image in detail.", model: str = None) -> Dict[str, Any]:
+        """Analyze an image using the vision model"""
+        
+        messages = self._image_messages(image_url, prompt)
         
         try:
+            self._run(self._rate_limiter.acquire())
             # Use the image model for vision tasks
             completion = self.client.chat.completions.create(
                 model=model or self.IMAGE_MODEL,
@@ -331,14 +1414,46 @@ Format your response clearly with headers."""
             return {"analysis": completion.choices[0].message.content}
         except Exception as e:
             return {"error": str(e)}
+    
+    def analyze_images(self, image_urls: List[str], prompt: str = "Describe this image in detail.", model: str = None) -> List[Dict[str, Any]]:
+        """Analyze several images concurrently, returning results in input order"""
+        return self._run(self.analyze_images_async(image_urls, prompt=prompt, model=model))
+    
+    async def analyze_images_async(self, image_urls: List[str], prompt: str = "Describe this image in detail.", model: str = None) -> List[Dict[str, Any]]:
+        """Analyze several images concurrently, returning results in input order"""
+        # Cap concurrent vision requests to stay within Groq rate limits
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_IMAGES)
+        return await asyncio.gather(*[self._analyze_one(url, prompt, model, semaphore) for url in image_urls])
+    
+    async def _analyze_one(self, image_url: str, prompt: str, model: str, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """Analyze a single image with the async client"""
+        async with semaphore:
+            try:
+                await self._rate_limiter.acquire()
+                completion = await self.async_client.chat.completions.create(
+                    model=model or self.IMAGE_MODEL,
+                    messages=self._image_messages(image_url, prompt),
+                    temperature=1,
+                    max_completion_tokens=1024,
+                    top_p=1,
+                    stream=False,
+                    stop=None,
+                )
+                return {"analysis": completion.choices[0].message.content}
+            except Exception as e:
+                return {"error": str(e)}
 
 
 # Singleton instance for easy import
 _groq_service = None
+_groq_service_lock = threading.Lock()
 
 def get_groq_service() -> GroqService:
     """Get or create the Groq service singleton"""
     global _groq_service
     if _groq_service is None:
-        _groq_service = GroqService()
+        # Streamlit sessions run on separate threads; build the service only once
+        with _groq_service_lock:
+            if _groq_service is None:
+                _groq_service = GroqService()
     return _groq_service
@@ -0,0 +1,77 @@
+"""
+LLM Cache Module - Persist finished tool results across sessions and restarts
+"""
+
+import hashlib
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+
+# Default location of the on-disk result cache
+LLM_CACHE_DIR = os.path.expanduser("~/.cache/ai_toolbox/llm")
+
+
+class LLMCache:
+    """Content-addressed, on-disk cache of tool results
+
+    Results are keyed by SHA-256 of (endpoint, style, model, text). Text is
+    only stripped, not lowercased: grammar and paraphrase output depends on
+    the input's casing, so "i went" and "I went" must not share a result.
+    Endpoint names should carry a prompt-template version so that editing a
+    prompt invalidates old results.
+
+    Without diskcache installed the cache silently stays disabled.
+    """
+
+    SIZE_LIMIT = 256 * 1024 * 1024
+
+    def __init__(self, directory: str = LLM_CACHE_DIR):
+        self._cache = None
+        if diskcache is not None:
+            try:
+                self._cache = diskcache.Cache(directory, size_limit=self.SIZE_LIMIT)
+            except Exception:
+                self._cache = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether results are being persisted"""
+        return self._cache is not None
+
+    @staticmethod
+    def key(endpoint: str, text: str, style: str = "", model: str = None) -> str:
+        """Build the cache key for a request"""
+        payload = orjson.dumps([endpoint, style or "", model or "", text.strip()])
+        return hashlib.sha256(payload).hexdigest()
+
+    def get(self, endpoint: str, text: str, style: str = "", model: str = None) -> Optional[Dict[str, Any]]:
+        """Return the stored result for a request, if any"""
+        if self._cache is None:
+            return None
+        try:
+            value = self._cache.get(self.key(endpoint, text, style, model))
+        except Exception:
+            return None
+        return orjson.loads(value) if value is not None else None
+
+    def set(self, endpoint: str, text: str, result: Dict[str, Any], style: str = "", model: str = None) -> None:
+        """Store a successful result"""
+        if self._cache is None:
+            return
+        try:
+            self._cache.set(self.key(endpoint, text, style, model), orjson.dumps(result))
+        except Exception:
+            # A full or read-only cache directory must never fail the request
+            pass
+
+    def clear(self) -> None:
+        """Drop all stored results"""
+        if self._cache is not None:
+            self._cache.clear()
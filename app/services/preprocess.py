@@ -0,0 +1,132 @@
+"""
+Text Preprocessing Module - Normalize and bound user text before it is sent to the LLM
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+
+# Whitespace runs in the pure-Python fallback
+_WHITESPACE_RUN = re.compile(r"\s+")
+
+# Sentence-ending characters used as truncation points
+_SENTENCE_ENDS = ".!?\n"
+
+
+def _is_space(c: int) -> bool:
+    """Unicode whitespace test on a code point, matching str.isspace"""
+    return (
+        (9 <= c <= 13) or (28 <= c <= 32) or c == 0x85 or c == 0xA0 or c == 0x1680
+        or (0x2000 <= c <= 0x200A) or c == 0x2028 or c == 0x2029 or c == 0x202F
+        or c == 0x205F or c == 0x3000
+    )
+
+
+def _clean_codepoints(src: np.ndarray, max_chars: int) -> np.ndarray:
+    """Collapse whitespace and truncate, working on an array of code points
+
+    A whitespace run becomes a blank line if it spans two or more newlines,
+    a newline if it contains one, and a single space otherwise. Leading and
+    trailing whitespace is dropped. If the result would exceed max_chars it
+    is cut at the last sentence end in the second half of the budget, or at
+    max_chars when there is none.
+    """
+    out = np.empty(min(src.shape[0], max_chars), dtype=np.uint32)
+    n = 0
+    newlines = 0
+    in_space = False
+    boundary = -1
+    truncated = False
+
+    for i in range(src.shape[0]):
+        c = src[i]
+        if _isspace(c):
+            in_space = True
+            if c == 10:
+                newlines += 1
+            continue
+
+        if in_space and n > 0:
+            if newlines > 0 and n < max_chars:
+                # Position of the last newline written, as str.rfind would report it
+                boundary = n + 1 if newlines >= 2 and n + 1 < max_chars else n
+            width = 2 if newlines >= 2 else 1
+            if n + width + 1 > max_chars:
+                truncated = True
+                break
+            if newlines >= 2:
+                out[n] = 10
+                out[n + 1] = 10
+            elif newlines == 1:
+                out[n] = 10
+            else:
+                out[n] = 32
+            n += width
+        in_space = False
+        newlines = 0
+
+        if n + 1 > max_chars:
+            truncated = True
+            break
+        out[n] = c
+        n += 1
+        if c == 46 or c == 33 or c == 63:
+            boundary = n
+
+    if truncated and boundary > max_chars // 2:
+        n = min(n, boundary)
+    return out[:n]
+
+
+# Whitespace test called by _clean_codepoints; replaced by its compiled version with numba
+_isspace = _is_space
+
+
+@lru_cache(maxsize=None)
+def _compiled_clean_codepoints():
+    """Compile the scanner with numba on first use (None without numba)
+
+    Importing numba takes a few hundred milliseconds, so it is deferred
+    until text is actually preprocessed rather than paid on module import.
+    """
+    global _isspace
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+
+    _isspace = njit(cache=True)(_is_space)
+    return njit(cache=True)(_clean_codepoints)
+
+
+def _clean_and_truncate_python(text: str, max_chars: int) -> str:
+    """Pure-Python equivalent of the compiled preprocessor"""
+
+    def collapse(match):
+        newlines = match.group().count("\n")
+        return "\n\n" if newlines >= 2 else "\n" if newlines else " "
+
+    text = _WHITESPACE_RUN.sub(collapse, text.strip())
+    if len(text) <= max_chars:
+        return text
+
+    head = text[:max_chars]
+    boundary = max(head.rfind(end) + (end != "\n") for end in _SENTENCE_ENDS)
+    return head[:boundary] if boundary > max_chars // 2 else head
+
+
+def clean_and_truncate(text: str, max_chars: int) -> str:
+    """Collapse whitespace runs and truncate text to at most max_chars characters
+
+    Paragraph breaks survive as blank lines. Truncation prefers a sentence
+    boundary. Uses a numba-compiled scanner when numba is installed.
+    """
+    compiled = _compiled_clean_codepoints()
+    if compiled is None:
+        return _clean_and_truncate_python(text, max_chars).rstrip()
+
+    codepoints = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    cleaned = compiled(codepoints, max_chars)
+    return cleaned.tobytes().decode("utf-32-le").rstrip()
@@ -0,0 +1,289 @@
+"""
+Semantic Cache Module - Reuse LLM responses for near-duplicate prompts
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+# Default location of the int8-quantized ONNX export of the embedding model
+QUANTIZED_MODEL_DIR = os.path.expanduser("~/.cache/ai_toolbox/minilm-int8")
+
+
+def export_quantized_model(model_name: str, output_dir: str = QUANTIZED_MODEL_DIR) -> str:
+    """Export a sentence-transformers model to ONNX and quantize it to int8
+
+    Requires optimum[onnxruntime]; an offline step, run once per machine with
+    ``python -m app.services.semantic_cache`` (never triggered by the cache).
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    quantizer = ORTQuantizer.from_pretrained(model)
+    config = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=output_dir, quantization_config=config)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(output_dir)
+    return output_dir
+
+
+class OnnxEncoder:
+    """Mean-pooled sentence embeddings from a quantized ONNX model
+
+    Mirrors the small part of the SentenceTransformer API used by the cache.
+    """
+
+    MAX_LENGTH = 256
+
+    def __init__(self, model_dir: str):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.MAX_LENGTH)
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(model_dir, "model_quantized.onnx"),
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def encode(self, text: str, normalize_embeddings: bool = False) -> np.ndarray:
+        encoding = self.tokenizer.encode(text)
+        inputs = {
+            "input_ids": np.array([encoding.ids], dtype=np.int64),
+            "attention_mask": np.array([encoding.attention_mask], dtype=np.int64),
+            "token_type_ids": np.array([encoding.type_ids], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0][0]
+
+        # Mean pooling over real tokens, as in the original sentence-transformers model
+        mask = inputs["attention_mask"][0][:, None].astype(np.float32)
+        vector = (hidden * mask).sum(axis=0) / np.maximum(mask.sum(), 1e-9)
+        if normalize_embeddings:
+            vector = vector / np.maximum(np.linalg.norm(vector), 1e-12)
+        return vector
+
+
+class FlatSpace:
+    """Exact nearest-neighbour search over one namespace's embedding matrix"""
+
+    def __init__(self, dim: int):
+        self.ids: List[int] = []
+        self.matrix = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, entry_id: int, vector: np.ndarray) -> None:
+        self.ids.append(entry_id)
+        self.matrix = np.vstack([self.matrix, vector[None, :]])
+
+    def remove(self, entry_id: int) -> None:
+        row = self.ids.index(entry_id)
+        del self.ids[row]
+        self.matrix = np.delete(self.matrix, row, axis=0)
+
+    def search(self, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        """Return the closest entry id and its cosine similarity"""
+        if not self.ids:
+            return None, -1.0
+        # Embeddings are normalized, so one GEMV gives cosine similarities
+        sims = self.matrix @ vector
+        best = int(np.argmax(sims))
+        return self.ids[best], float(sims[best])
+
+
+class HnswSpace:
+    """Approximate nearest-neighbour search with a FAISS HNSW graph
+
+    Vectors are stored as float16, halving the memory of the flat matrix.
+    HNSW graphs cannot delete nodes, so evicted entries are tombstoned and
+    the graph is rebuilt once half of it is stale.
+    """
+
+    M = 32
+    SEARCH_K = 4
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._reset()
+
+    def _reset(self) -> None:
+        self.index = faiss.IndexHNSWSQ(self.dim, faiss.ScalarQuantizer.QT_fp16, self.M, faiss.METRIC_INNER_PRODUCT)
+        # graph position -> entry id (None once evicted), and the reverse for live entries
+        self.ids: List[Optional[int]] = []
+        self.positions: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def add(self, entry_id: int, vector: np.ndarray) -> None:
+        self.add_many([entry_id], vector[None, :])
+
+    def add_many(self, entry_ids: List[int], vectors: np.ndarray) -> None:
+        for entry_id in entry_ids:
+            self.positions[entry_id] = len(self.ids)
+            self.ids.append(entry_id)
+        self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+
+    def remove(self, entry_id: int) -> None:
+        self.ids[self.positions.pop(entry_id)] = None
+        if len(self.positions) * 2 < len(self.ids):
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        live = [(entry_id, position) for position, entry_id in enumerate(self.ids) if entry_id is not None]
+        vectors = [self.index.reconstruct(position) for _, position in live]
+        self._reset()
+        if live:
+            self.add_many([entry_id for entry_id, _ in live], np.vstack(vectors))
+
+    def search(self, vector: np.ndarray) -> Tuple[Optional[int], float]:
+        """Return the closest live entry id and its cosine similarity"""
+        if not self.positions:
+            return None, -1.0
+        sims, positions = self.index.search(vector[None, :].astype(np.float32), min(self.SEARCH_K, len(self.ids)))
+        for sim, position in zip(sims[0], positions[0]):
+            if position != -1 and self.ids[position] is not None:
+                return self.ids[position], float(sim)
+        return None, -1.0
+
+
+class SemanticCache:
+    """Embedding-based response cache with LRU eviction
+
+    Entries are grouped into namespaces (e.g. one per task type) so a
+    paraphrase can never be returned for a chat message. The embedding
+    model is loaded lazily on first use, preferring an int8-quantized ONNX
+    export (see export_quantized_model) and falling back to
+    sentence-transformers. With neither available the cache silently stays
+    disabled.
+
+    Loading and embedding are CPU-bound and may block; async callers should
+    run embed() in a worker thread.
+
+    Each namespace starts as an exact FlatSpace and moves to a FAISS
+    HnswSpace once it holds HNSW_MIN_ENTRIES entries (if faiss is installed).
+    """
+
+    EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+    HNSW_MIN_ENTRIES = 256
+
+    def __init__(self, threshold: float = 0.92, max_entries: int = 1024, model_name: str = None, quantized_model_dir: str = QUANTIZED_MODEL_DIR):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.model_name = model_name or self.EMBEDDING_MODEL
+        self.quantized_model_dir = quantized_model_dir
+
+        self._encoder = None
+        self._available = True
+        self._lock = threading.Lock()
+
+        # entry id -> (namespace, response), ordered from least to most recently used
+        self._entries: "OrderedDict[int, Tuple[str, str]]" = OrderedDict()
+        # namespace -> search structure over normalized embeddings
+        self._spaces: Dict[str, Union[FlatSpace, HnswSpace]] = {}
+        self._next_id = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether an embedding model is available"""
+        return self._load_encoder() is not None
+
+    def _load_encoder(self):
+        """Load the embedding model once"""
+        if self._encoder is None and self._available:
+            with self._lock:
+                if self._encoder is None and self._available:
+                    self._encoder = self._load_onnx_encoder() or self._load_torch_encoder()
+                    self._available = self._encoder is not None
+        return self._encoder
+
+    def _load_onnx_encoder(self):
+        """Load the int8-quantized ONNX model, if it has been exported"""
+        if not os.path.exists(os.path.join(self.quantized_model_dir, "model_quantized.onnx")):
+            return None
+        try:
+            return OnnxEncoder(self.quantized_model_dir)
+        except Exception:
+            return None
+
+    def _load_torch_encoder(self):
+        """Load the full-precision sentence-transformers model"""
+        try:
+            from sentence_transformers import SentenceTransformer
+            return SentenceTransformer(self.model_name)
+        except Exception:
+            return None
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """Return a unit-length float32 embedding, or None when disabled"""
+        encoder = self._load_encoder()
+        if encoder is None:
+            return None
+        vector = encoder.encode(text, normalize_embeddings=True)
+        return np.asarray(vector, dtype=np.float32)
+
+    def lookup(self, namespace: str, vector: np.ndarray) -> Optional[str]:
+        """Return the cached response most similar to vector, if close enough"""
+        with self._lock:
+            space = self._spaces.get(namespace)
+            if space is None:
+                return None
+
+            entry_id, similarity = space.search(vector)
+            if entry_id is None or similarity < self.threshold:
+                return None
+
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id][1]
+
+    def store(self, namespace: str, vector: np.ndarray, response: str) -> None:
+        """Add a response to the cache, evicting the least recently used entry"""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (namespace, response)
+
+            space = self._spaces.get(namespace)
+            if space is None:
+                space = self._spaces[namespace] = FlatSpace(vector.shape[0])
+            space.add(entry_id, vector)
+
+            # Switch large namespaces to sub-linear search
+            if faiss is not None and isinstance(space, FlatSpace) and len(space) >= self.HNSW_MIN_ENTRIES:
+                hnsw = HnswSpace(vector.shape[0])
+                hnsw.add_many(space.ids, space.matrix)
+                self._spaces[namespace] = hnsw
+
+            while len(self._entries) > self.max_entries:
+                old_id, (old_namespace, _) = self._entries.popitem(last=False)
+                self._remove(old_namespace, old_id)
+
+    def _remove(self, namespace: str, entry_id: int) -> None:
+        """Drop a single entry from a namespace"""
+        space = self._spaces[namespace]
+        space.remove(entry_id)
+        if not len(space):
+            del self._spaces[namespace]
+
+    def clear(self) -> None:
+        """Drop all cached responses"""
+        with self._lock:
+            self._entries.clear()
+            self._spaces.clear()
+
+
+if __name__ == "__main__":
+    # Offline export of the quantized embedding model used by the cache
+    print(export_quantized_model(SemanticCache.EMBEDDING_MODEL))
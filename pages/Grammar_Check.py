@@ -1,41 +1,124 @@
 import streamlit as st
+import asyncio
+import html
 import sys
 import os
 
-# Add the project root to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add the project root to Python path for imports (once, not on every rerun)
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
 
-from app.services.groq_service import get_groq_service
+from app.services.groq_client import get_cached_groq_service, lookup_paragraphs, store_paragraphs, warn_if_rate_limited
 
 st.title("Grammar Check")
 st.write("Improve your writing with our AI-powered grammar checker")
 
-# Initialize Groq service
-@st.cache_resource
-def init_groq_service():
-    try:
-        return get_groq_service()
-    except ValueError as e:
-        st.error(f"Configuration Error: {str(e)}")
-        return None
-
-groq_service = init_groq_service()
+# Initialize Groq service (one cached instance shared by every page)
+groq_service = get_cached_groq_service()
 
 user_text = st.text_area("Enter your text here:", height=150)
 
+def check_paragraphs(paragraphs):
+    """Check paragraphs using Groq API directly, yielding corrections as they stream in
+
+    The final event is a list of check_grammar results, one per paragraph.
+    """
+    # Several paragraphs are checked together in one batched request
+    if len(paragraphs) > 1:
+        try:
+            result = groq_service.run(groq_service.check_grammar_batch_async(paragraphs), timeout=30)
+        except asyncio.TimeoutError:
+            result = {"error": "The request timed out. Please try again."}
+        yield result if "error" in result else result["paragraph_results"]
+        return
+    
+    for event in groq_service.check_grammar_stream(paragraphs[0]):
+        yield [event] if "original_text" in event else event
+
 def check_grammar(text):
-    """Check grammar using Groq API directly"""
+    """Check grammar using Groq API directly, yielding corrections as they stream in"""
     if groq_service is None:
-        return {"error": "Groq service not initialized. Please check your API key."}
+        yield {"error": "Groq service not initialized. Please check your API key."}
+        return
+    
+    # Only send paragraphs without a known result from earlier in this session
+    paragraphs = [p for p in text.split("\n\n") if p.strip()]
+    keys, results, missing = lookup_paragraphs("grammar_paragraph_results", paragraphs)
+    
+    if missing:
+        for event in check_paragraphs(list(missing.values())):
+            if isinstance(event, list):
+                new = dict(zip(missing, event))
+                results.update(new)
+                
+                # Partial results (unparsed, or without grammar rules) are checked again next time
+                store_paragraphs("grammar_paragraph_results", {key: result for key, result in new.items() if not result.get("partial")})
+            elif "correction" in event:
+                yield event
+            else:
+                # Errors end the check
+                yield event
+                return
+    
+    # Merge the per-paragraph results back in input order
+    yield {
+        "original_text": text,
+        "corrected_text": "\n\n".join(results[key]["corrected_text"] for key in keys),
+        "corrections": [correction for key in keys for correction in results[key]["corrections"]]
+    }
+
+
+def correction_markdown(correction):
+    """Render a correction, with its grammar rule if available, as one markdown string
+    
+    The block is rendered with unsafe_allow_html for the colored spans, so
+    every model-written field (which often echoes the user's text) is escaped.
+    """
+    def escape(value):
+        return html.escape(str(value))
+    
+    parts = [
+        f"**Error:** <span style='color:red'>{escape(correction.get('error', 'N/A'))}</span>",
+        f"**Suggestion:** <span style='color:green'>{escape(correction.get('suggestion', 'N/A'))}</span>",
+        f"**Explanation:** _{escape(correction.get('explanation', 'No explanation provided'))}_"
+    ]
+    
+    rule = correction.get('grammar_rule')
+    if rule:
+        parts.append("**Grammar Rule:**")
+        parts.append(f"**{escape(rule.get('rule_name', 'Rule'))}**")
+        if rule.get('description'):
+            parts.append(escape(rule['description']))
+        
+        if rule.get('correct_examples'):
+            parts.append("**Correct Examples:**")
+            parts.append("\n".join(f"- ✅ *{escape(example)}*" for example in rule['correct_examples']))
+        
+        if rule.get('incorrect_examples'):
+            parts.append("**Incorrect Examples:**")
+            parts.append("\n".join(f"- ❌ *{escape(example)}*" for example in rule['incorrect_examples']))
     
-    return groq_service.check_grammar(text)
+    return "\n\n".join(parts)
 
 
 if st.button("Find Grammatical Mistakes"):
     if user_text:
-        with st.spinner("Checking grammar..."):
-            fixed_grammar = check_grammar(user_text)
+        # Let the user know when the check has to wait for the rate limit
+        warn_if_rate_limited(groq_service, paragraphs=len([p for p in user_text.split("\n\n") if p.strip()]))
+        
+        fixed_grammar = None
+        with st.status("Checking grammar...", expanded=True) as status:
+            # Show each correction as soon as it arrives; the final event is the full result
+            for event in check_grammar(user_text):
+                if "correction" in event:
+                    correction = event["correction"]
+                    st.markdown(f"- ~~{correction.get('error', 'N/A')}~~ → **{correction.get('suggestion', 'N/A')}**")
+                else:
+                    fixed_grammar = event
+            status.update(label="Grammar check complete", state="complete", expanded=False)
 
+        if fixed_grammar is not None:
             if "error" in fixed_grammar:
                 st.error(f"Error: {fixed_grammar['error']}")
             else:
@@ -46,11 +129,13 @@ if st.button("Find Grammatical Mistakes"):
                 
                 with col1:
                     st.markdown("### Original Text")
-                    st.info(fixed_grammar["original_text"])
+                    with st.container(border=True):
+                        st.markdown(fixed_grammar["original_text"])
                 
                 with col2:
                     st.markdown("### Corrected Text")
-                    st.success(fixed_grammar["corrected_text"])
+                    with st.container(border=True):
+                        st.markdown(fixed_grammar["corrected_text"])
                 
                 # Display corrections
                 if fixed_grammar["corrections"]:
@@ -58,36 +143,8 @@ if st.button("Find Grammatical Mistakes"):
                     
                     for i, correction in enumerate(fixed_grammar["corrections"]):
                         with st.expander(f"Correction {i+1}: {correction.get('type', 'Unknown').title()}"):
-                            cols = st.columns([1, 1])
-                            with cols[0]:
-                                st.markdown("**Error:**")
-                                st.markdown(f"<span style='color:red'>{correction.get('error', 'N/A')}</span>", unsafe_allow_html=True)
-                            
-                            with cols[1]:
-                                st.markdown("**Suggestion:**")
-                                st.markdown(f"<span style='color:green'>{correction.get('suggestion', 'N/A')}</span>", unsafe_allow_html=True)
-                            
-                            st.markdown("**Explanation:**")
-                            st.markdown(f"_{correction.get('explanation', 'No explanation provided')}_")
-                            
-                            # Add Grammar Rule section if available
-                            if 'grammar_rule' in correction and correction['grammar_rule']:
-                                st.markdown("**Grammar Rule:**")
-                                rule = correction['grammar_rule']
-                                st.markdown(f"**{rule.get('rule_name', 'Rule')}**")
-                                st.markdown(rule.get('description', ''))
-                                
-                                # Display correct examples
-                                if rule.get('correct_examples'):
-                                    st.markdown("**Correct Examples:**")
-                                    for example in rule['correct_examples']:
-                                        st.markdown(f"- ✅ *{example}*")
-                                
-                                # Display incorrect examples
-                                if rule.get('incorrect_examples'):
-                                    st.markdown("**Incorrect Examples:**")
-                                    for example in rule['incorrect_examples']:
-                                        st.markdown(f"- ❌ *{example}*")
+                            # One markdown block per correction instead of an element per line
+                            st.markdown(correction_markdown(correction), unsafe_allow_html=True)
                             
                     # Summary
                     st.success(f"Found {len(fixed_grammar['corrections'])} grammar issues to fix.")
@@ -1,88 +1,155 @@
 import streamlit as st
+import asyncio
 import sys
 import os
+from types import MappingProxyType
+from concurrent.futures import Future
 
-# Add the project root to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add the project root to Python path for imports (once, not on every rerun)
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
 
-from app.services.groq_service import get_groq_service
+from app.services.groq_client import get_cached_groq_service, get_executor, lookup_paragraphs, store_paragraphs, warn_if_rate_limited
 
 st.title("Text Paraphraser")
 st.write("Transform your text with our AI-powered paraphrasing tool")
 
-# Initialize Groq service
-@st.cache_resource
-def init_groq_service():
-    try:
-        return get_groq_service()
-    except ValueError as e:
-        st.error(f"Configuration Error: {str(e)}")
-        return None
+# Initialize Groq service (one cached instance shared by every page)
+groq_service = get_cached_groq_service()
 
-groq_service = init_groq_service()
+# Paraphrasing styles and their descriptions, in display order (read-only)
+_STYLE_DESCRIPTIONS = MappingProxyType({
+    "Fluency": "Makes the text flow naturally and smoothly, focusing on readability.",
+    "Humanize": "Makes the text sound more conversational, warm, and relatable.",
+    "Formal": "Uses professional language, avoids contractions, and maintains a respectful tone.",
+    "Academic": "Uses scholarly language, precise terminology, and complex sentence structures.",
+    "Simple": "Uses straightforward language, short sentences, and common words.",
+    "Creative": "Uses vivid language, metaphors, and unique expressions.",
+    "Shorten": "Condenses the text while preserving the key information."
+})
 
 user_text = st.text_area("Enter your text here:", height=150)
 
 # Style selection
 style = st.selectbox(
     "Select paraphrasing style:",
-    ["Fluency", "Humanize", "Formal", "Academic", "Simple", "Creative", "Shorten"],
+    list(_STYLE_DESCRIPTIONS),
     index=0
 )
 
-# Style descriptions
-style_descriptions = {
-    "Fluency": "Makes the text flow naturally and smoothly, focusing on readability.",
-    "Humanize": "Makes the text sound more conversational, warm, and relatable.",
-    "Formal": "Uses professional language, avoids contractions, and maintains a respectful tone.",
-    "Academic": "Uses scholarly language, precise terminology, and complex sentence structures.",
-    "Simple": "Uses straightforward language, short sentences, and common words.",
-    "Creative": "Uses vivid language, metaphors, and unique expressions.",
-    "Shorten": "Condenses the text while preserving the key information."
-}
-
 # Display the description of the selected style
-st.info(style_descriptions[style])
+st.info(_STYLE_DESCRIPTIONS[style])
+
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def cached_paraphrase(paragraphs, style):
+    """Paraphrase paragraphs, memoized across reruns (errors are raised so they are never cached)"""
+    # Several paragraphs are paraphrased together in one batched request
+    if len(paragraphs) > 1:
+        result = groq_service.run(groq_service.paraphrase_batch_async(list(paragraphs), style), timeout=30)
+    else:
+        result = groq_service.run(groq_service.paraphrase_async(paragraphs[0], style), timeout=30)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result.get("paraphrased_paragraphs") or [result["paraphrased_text"]]
 
-def paraphrase_text(text, style):
-    """Paraphrase text using Groq API directly"""
+def paraphrase_text(paragraphs, style):
+    """Paraphrase paragraphs using Groq API directly"""
     if groq_service is None:
         return {"error": "Groq service not initialized. Please check your API key."}
     
-    return groq_service.paraphrase(text, style)
+    try:
+        return {"paraphrases": cached_paraphrase(tuple(paragraphs), style)}
+    except asyncio.TimeoutError:
+        return {"error": "The request timed out. Please try again."}
+    except RuntimeError as e:
+        return {"error": str(e)}
+
+
+def start_paraphrase_job(text, style):
+    """Paraphrase the paragraphs without a known result in the background"""
+    # Only send paragraphs without a known paraphrase from earlier in this session
+    paragraphs = [p for p in text.split("\n\n") if p.strip()]
+    keys, known, missing = lookup_paragraphs("paraphrase_paragraph_results", paragraphs, style)
+    
+    if missing:
+        future = get_executor().submit(paraphrase_text, list(missing.values()), style)
+    else:
+        future = Future()
+        future.set_result({"paraphrases": []})
+    
+    return {"future": future, "style": style, "text": text, "keys": keys, "known": known, "missing_keys": list(missing)}
+
+def finish_paraphrase_job(job):
+    """Merge a finished job's paraphrases with the known ones into one result"""
+    result = job["future"].result()
+    if "error" in result:
+        return result
+    
+    new = dict(zip(job["missing_keys"], result["paraphrases"]))
+    paraphrases = {**job["known"], **new}
+    store_paragraphs("paraphrase_paragraph_results", new)
+    
+    return {
+        "original_text": job["text"],
+        "paraphrased_text": "\n\n".join(paraphrases[key] for key in job["keys"]),
+        "style": job["style"]
+    }
+
+
+def show_paraphrase_progress(style):
+    """Poll the background request, rerunning the page once it finishes"""
+    if st.session_state.paraphrase_job["future"].done():
+        st.rerun()
+    st.info(f"⏳ Paraphrasing in {style} style...")
 
 
 if st.button("Paraphrase Text"):
     if user_text:
-        with st.spinner(f"Paraphrasing in {style} style..."):
-            paraphrased = paraphrase_text(user_text, style)
-
-            if "error" in paraphrased:
-                st.error(f"Error: {paraphrased['error']}")
-            else:
-                st.subheader("Results:")
-
-                # Original vs Paraphrased Text
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.markdown("### Original Text")
-                    st.info(paraphrased["original_text"])
-                
-                with col2:
-                    st.markdown(f"### Paraphrased Text ({style})")
-                    st.success(paraphrased["paraphrased_text"])
-                
-                # Add a download button for the paraphrased text
-                st.download_button(
-                    label="Download Paraphrased Text",
-                    data=paraphrased["paraphrased_text"],
-                    file_name="paraphrased_text.txt",
-                    mime="text/plain"
-                )
+        # Let the user know when the request has to wait for the rate limit
+        warn_if_rate_limited(groq_service, paragraphs=len([p for p in user_text.split("\n\n") if p.strip()]))
+        
+        # Run the request in the background so the page stays interactive
+        st.session_state.paraphrase_job = start_paraphrase_job(user_text, style)
     else:
         st.warning("Please enter some text to paraphrase.")
 
+paraphrase_job = st.session_state.get("paraphrase_job")
+if paraphrase_job is not None:
+    if not paraphrase_job["future"].done():
+        # Poll once a second without rerunning the rest of the page
+        st.fragment(run_every=1)(show_paraphrase_progress)(paraphrase_job["style"])
+    else:
+        if "result" not in paraphrase_job:
+            paraphrase_job["result"] = finish_paraphrase_job(paraphrase_job)
+        paraphrased = paraphrase_job["result"]
+
+        if "error" in paraphrased:
+            st.error(f"Error: {paraphrased['error']}")
+        else:
+            st.subheader("Results:")
+
+            # Original vs Paraphrased Text
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("### Original Text")
+                with st.container(border=True):
+                    st.markdown(paraphrased["original_text"])
+            
+            with col2:
+                st.markdown(f"### Paraphrased Text ({paraphrase_job['style']})")
+                with st.container(border=True):
+                    st.markdown(paraphrased["paraphrased_text"])
+            
+            # Add a download button for the paraphrased text
+            st.download_button(
+                label="Download Paraphrased Text",
+                data=paraphrased["paraphrased_text"],
+                file_name="paraphrased_text.txt",
+                mime="text/plain"
+            )
+
 # Add tips section
 with st.expander("Tips for Better Results"):
     st.markdown("""
@@ -1,22 +1,17 @@
 import streamlit as st
+import asyncio
 import sys
 import os
 
-# Add the project root to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add the project root to Python path for imports (once, not on every rerun)
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
 
-from app.services.groq_service import get_groq_service
+from app.services.groq_client import get_cached_groq_service, get_executor, warn_if_rate_limited
 
-# Initialize Groq service
-@st.cache_resource
-def init_groq_service():
-    try:
-        return get_groq_service()
-    except ValueError as e:
-        st.error(f"Configuration Error: {str(e)}")
-        return None
-
-groq_service = init_groq_service()
+# Initialize Groq service (one cached instance shared by every page)
+groq_service = get_cached_groq_service()
 
 
 def plagiarism_checker_page():
@@ -40,7 +35,7 @@ def plagiarism_checker_page():
                 try:
                     import docx
                     doc = docx.Document(uploaded_file)
-                    text_to_check = "\n".join([para.text for para in doc.paragraphs])
+                    text_to_check = "\n".join(para.text for para in doc.paragraphs)
                     st.success(f"File '{uploaded_file.name}' loaded successfully!")
                 except Exception as e:
                     st.error(f"Error reading .docx file: {str(e)}")
@@ -49,24 +44,53 @@ def plagiarism_checker_page():
     
     if st.button("Check for Plagiarism"):
         if 'text_to_check' in locals() and text_to_check:
-            with st.spinner("Analyzing text for potential plagiarism..."):
-                # Call the plagiarism checking function directly
-                result = check_plagiarism(text_to_check)
-                
-                if "error" in result:
-                    st.error(f"Error: {result['error']}")
-                else:
-                    # Display the results
-                    display_plagiarism_results(result, text_to_check)
+            # Let the user know when the request has to wait for the rate limit
+            warn_if_rate_limited(groq_service)
+            
+            # Run the check in the background so the page stays interactive
+            st.session_state.plagiarism_job = get_executor().submit(check_plagiarism, text_to_check)
         else:
             st.warning("Please enter some text or upload a file to check for plagiarism.")
+    
+    job = st.session_state.get("plagiarism_job")
+    if job is not None:
+        if not job.done():
+            # Poll once a second without rerunning the rest of the page
+            st.fragment(run_every=1)(show_plagiarism_progress)()
+        else:
+            result = job.result()
+            
+            if "error" in result:
+                st.error(f"Error: {result['error']}")
+            else:
+                # Display the results
+                display_plagiarism_results(result, result["original_text"])
+
+def show_plagiarism_progress():
+    """Poll the background check, rerunning the page once it finishes"""
+    if st.session_state.plagiarism_job.done():
+        st.rerun()
+    st.info("⏳ Analyzing text for potential plagiarism...")
+
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def cached_check_plagiarism(text):
+    """Check plagiarism, memoized across reruns (errors are raised so they are never cached)"""
+    result = groq_service.run(groq_service.check_plagiarism_async(text), timeout=30)
+    if "error" in result:
+        raise RuntimeError(result["error"])
+    return result
 
 def check_plagiarism(text):
     """Check plagiarism using Groq API directly"""
     if groq_service is None:
         return {"error": "Groq service not initialized. Please check your API key."}
     
-    return groq_service.check_plagiarism(text)
+    try:
+        return cached_check_plagiarism(text)
+    except asyncio.TimeoutError:
+        return {"error": "The request timed out. Please try again."}
+    except RuntimeError as e:
+        return {"error": str(e)}
 
 def display_plagiarism_results(result, original_text):
     """Display the plagiarism check results in a user-friendly way"""
@@ -83,7 +107,8 @@ def display_plagiarism_results(result, original_text):
         st.success("Content appears original.")
 
     st.markdown("### Feedback")
-    st.info(feedback)
+    with st.container(border=True):
+        st.markdown(feedback)
 
     if flagged:
         st.markdown("### Flagged Sentences")
@@ -1,62 +1,89 @@
 import streamlit as st
+import json
 import re
 import sys
 import os
+from operator import itemgetter
 
-# Add the project root to Python path for imports
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add the project root to Python path for imports (once, not on every rerun)
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT not in sys.path:
+    sys.path.insert(0, _ROOT)
 
-from app.services.groq_service import get_groq_service
+from app.services.groq_client import get_cached_groq_service, get_executor, warn_if_rate_limited
 
-# Initialize Groq service
-@st.cache_resource
-def init_groq_service():
-    try:
-        return get_groq_service()
-    except ValueError as e:
-        st.error(f"Configuration Error: {str(e)}")
-        return None
+# Initialize Groq service (one cached instance shared by every page)
+groq_service = get_cached_groq_service()
 
-groq_service = init_groq_service()
+# Video ID in the different YouTube URL formats. Streamlit re-executes this script on
+# every rerun, so this runs each time; re's internal pattern cache makes it a cheap lookup
+_YT_ID_RE = re.compile(r'(?:youtube\.com/watch\?v=|youtu\.be/|youtube\.com/embed/|youtube\.com/v/|youtube\.com/watch\?.*v=)([^&\n?#]+)')
 
 # --- Helper Functions --- #
 def extract_video_id(url):
     """Extract YouTube video ID from URL"""
-    # Regular expressions for different YouTube URL formats
-    patterns = [
-        r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/|youtube\.com\/v\/)([^&\n?#]+)',
-        r'youtube\.com\/watch\?.*v=([^&\n?#]+)'
-    ]
+    match = _YT_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+# Transcripts persisted across restarts, one JSON file per video
+TRANSCRIPT_CACHE_DIR = os.path.expanduser("~/.cache/ytsum/transcripts")
+
+
+def fetch_transcript(video_id):
+    """Download a transcript's text from YouTube"""
+    from youtube_transcript_api import YouTubeTranscriptApi
+    
+    # Use list_transcripts to get available transcripts, then fetch
+    transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
+    
+    # Try to get English transcript first, otherwise get the first available
+    try:
+        transcript = transcript_list.find_transcript(['en', 'en-US', 'en-GB'])
+    except:
+        # Get the first available transcript
+        transcript = transcript_list.find_generated_transcript(['en', 'en-US', 'en-GB'])
+    
+    # Fetch the actual transcript data
+    transcript_data = transcript.fetch()
+    
+    # Combine all transcript parts into one text
+    return " ".join(map(itemgetter('text'), transcript_data))
+
+
+@st.cache_data(ttl=86400, max_entries=256, show_spinner=False)
+def load_transcript(video_id):
+    """Get a transcript from the disk cache, fetching it on a miss (failures are raised, never cached)"""
+    # Only plain IDs are used as file names
+    path = None
+    if re.fullmatch(r"[A-Za-z0-9_-]+", video_id):
+        path = os.path.join(TRANSCRIPT_CACHE_DIR, f"{video_id}.json")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)["transcript"]
+        except (OSError, ValueError, KeyError):
+            pass
     
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
+    transcript = fetch_transcript(video_id)
     
-    return None
+    if path is not None:
+        try:
+            os.makedirs(TRANSCRIPT_CACHE_DIR, exist_ok=True)
+            # Write then rename so a concurrent reader never sees a partial file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"transcript": transcript}, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+    
+    return transcript
 
 
 def get_youtube_transcript(video_id):
     """Get transcript from YouTube video using youtube-transcript-api"""
     try:
-        from youtube_transcript_api import YouTubeTranscriptApi
-        
-        # Use list_transcripts to get available transcripts, then fetch
-        transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-        
-        # Try to get English transcript first, otherwise get the first available
-        try:
-            transcript = transcript_list.find_transcript(['en', 'en-US', 'en-GB'])
-        except:
-            # Get the first available transcript
-            transcript = transcript_list.find_generated_transcript(['en', 'en-US', 'en-GB'])
-        
-        # Fetch the actual transcript data
-        transcript_data = transcript.fetch()
-        
-        # Combine all transcript parts into one text
-        full_transcript = " ".join([item['text'] for item in transcript_data])
-        return {"transcript": full_transcript}
+        return {"transcript": load_transcript(video_id)}
     except ImportError:
         return {"error": "youtube-transcript-api is not installed. Please run: pip install youtube-transcript-api"}
     except Exception as e:
@@ -66,8 +93,40 @@ def get_youtube_transcript(video_id):
         return {"error": f"Error getting transcript: {error_msg}"}
 
 
-def summarize_video(video_id):
-    """Get transcript and summarize using Groq"""
+# Transcript budget in tokens, leaving room for the prompt and a 2048-token
+# summary within Groq's per-minute token limits
+MAX_TRANSCRIPT_TOKENS = 6000
+
+
+@st.cache_resource(show_spinner=False)
+def get_token_encoder():
+    """Load the tiktoken encoding once per process (None without tiktoken)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def truncate_transcript(transcript):
+    """Cut a transcript down to MAX_TRANSCRIPT_TOKENS tokens"""
+    encoder = get_token_encoder()
+    if encoder is None:
+        # Roughly four characters per token
+        max_chars = MAX_TRANSCRIPT_TOKENS * 4
+        if len(transcript) > max_chars:
+            return transcript[:max_chars] + "... [transcript truncated]"
+        return transcript
+    
+    # Transcripts are user content, so special-token text is encoded as plain text
+    tokens = encoder.encode(transcript, disallowed_special=())
+    if len(tokens) > MAX_TRANSCRIPT_TOKENS:
+        return encoder.decode(tokens[:MAX_TRANSCRIPT_TOKENS]) + "... [transcript truncated]"
+    return transcript
+
+
+def get_summary_transcript(video_id):
+    """Get the transcript to summarize, truncated to fit Groq's token limits"""
     if groq_service is None:
         return {"error": "Groq service not initialized. Please check your API key."}
     
@@ -76,15 +135,8 @@ def summarize_video(video_id):
     if "error" in transcript_result:
         return transcript_result
     
-    # Summarize with Groq
-    transcript = transcript_result["transcript"]
-    
     # Truncate if too long (Groq has token limits)
-    max_chars = 15000  # Roughly 3750 tokens
-    if len(transcript) > max_chars:
-        transcript = transcript[:max_chars] + "... [transcript truncated]"
-    
-    return groq_service.summarize_youtube(transcript)
+    return {"transcript": truncate_transcript(transcript_result["transcript"])}
 
 # --- Session State Initialization --- #
 if 'summary_history' not in st.session_state:
@@ -95,15 +147,18 @@ st.set_page_config(page_title="YouTube Summarizer", layout="wide")
 st.title("📺 YouTube Video Summarizer")
 st.write("Enter a YouTube URL to get an AI-powered summary of the video content!")
 
-# Sidebar for history
+# Sidebar for history, showing only the most recent videos
+MAX_HISTORY_SHOWN = 20
+
 st.sidebar.header("Summary History")
 if st.session_state.summary_history:
-    for i, entry in enumerate(reversed(st.session_state.summary_history)):
-        with st.sidebar.expander(f"Video {len(st.session_state.summary_history) - i}"):
+    total = len(st.session_state.summary_history)
+    for i, entry in enumerate(reversed(st.session_state.summary_history[-MAX_HISTORY_SHOWN:])):
+        with st.sidebar.expander(f"Video {total - i}"):
             st.markdown(f"**URL:** {entry['url'][:50]}...")
             if 'title' in entry:
                 st.markdown(f"**Title:** {entry['title']}")
-            st.markdown(f"**Summary:** {entry['summary'][:100]}...")
+            st.markdown(f"**Summary:** {entry['summary_preview']}...")
 else:
     st.sidebar.info("No videos summarized yet.")
 
@@ -143,31 +198,58 @@ with col2:
     # Summarize button
     if st.button("🔄 Summarize Video", disabled=not video_id, help="Click to generate AI summary"):
         if video_id:
-            with st.spinner("🤖 Analyzing video content... This may take a few minutes."):
-                result = summarize_video(video_id)
+            with st.spinner("📜 Fetching video transcript..."):
+                # Open the API connection while the transcript downloads
+                if groq_service is not None:
+                    get_executor().submit(groq_service.ping)
+                transcript_result = get_summary_transcript(video_id)
                 
-                if "error" in result:
-                    st.error(f"❌ {result['error']}")
-                else:
-                    # Store in history
-                    history_entry = {
-                        "url": youtube_url,
-                        "video_id": video_id,
-                        "summary": result.get("summary", "Summary not available"),
-                        "title": result.get("title", "Title not available")
-                    }
-                    st.session_state.summary_history.append(history_entry)
-                    
-                    # Display results
-                    st.success("✅ Video summarized successfully!")
+            if "error" in transcript_result:
+                st.error(f"❌ {transcript_result['error']}")
+            else:
+                # The summary is streamed into the main area below
+                st.session_state.pending_summary = {
+                    "url": youtube_url,
+                    "video_id": video_id,
+                    "transcript": transcript_result["transcript"]
+                }
     
     # Clear history button
     if st.button("🗑️ Clear History"):
         st.session_state.summary_history = []
         st.success("History cleared!")
 
+# Stream a newly requested summary as it is generated
+pending_summary = st.session_state.pop("pending_summary", None)
+if pending_summary:
+    st.markdown("---")
+    st.subheader("📝 Latest Summary")
+    st.markdown("**📋 Summary:**")
+    
+    # Let the user know when the request has to wait for the rate limit
+    warn_if_rate_limited(groq_service)
+    
+    try:
+        summary = st.write_stream(groq_service.summarize_youtube_stream(pending_summary["transcript"]))
+    except Exception as e:
+        st.error(f"❌ {str(e)}")
+    else:
+        # Store in history
+        summary = summary or "Summary not available"
+        history_entry = {
+            "url": pending_summary["url"],
+            "video_id": pending_summary["video_id"],
+            "summary": summary,
+            "summary_preview": summary[:100],
+            "title": "YouTube Video Summary"
+        }
+        st.session_state.summary_history.append(history_entry)
+        
+        # Rerun to show the finished summary with the history
+        st.rerun()
+
 # Display current summary results
-if st.session_state.summary_history:
+elif st.session_state.summary_history:
     latest_summary = st.session_state.summary_history[-1]
     
     st.markdown("---")
@@ -179,7 +261,8 @@ if st.session_state.summary_history:
     
     # Display summary
     st.markdown("**📋 Summary:**")
-    st.info(latest_summary['summary'])
+    with st.container(border=True):
+        st.markdown(latest_summary['summary'])
     
     # Display video URL
     st.markdown(f"**🔗 Source:** [Watch Video]({latest_summary['url']})")